@@ -0,0 +1,39 @@
+"""Compare stamping RST mtimes with one "git log" per file against the single history walk used by export().
+
+Usage: python benchmarks/bench_export.py [DOCS ...]
+"""
+
+import sys
+import tempfile
+
+from common import make_repos, Timer
+
+from sphinxcontrib_versioning.git import last_modified, run_command
+
+
+def legacy_mtimes(local_root, commit, paths):
+    """Previous implementation: one "git log -n1" per file."""
+    return {
+        p: int(run_command(local_root, ["git", "log", "-n1", "--format=%at", commit, "--", p]))
+        for p in paths
+    }
+
+
+def main(sizes):
+    """Print one row per number of documents."""
+    print("{:>6} {:>10} {:>10}".format("docs", "legacy s", "walk s"))
+    for docs in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local = make_repos(temp_dir, refs=0, docs=docs, depth=docs * 2)
+            commit = run_command(local, ["git", "rev-parse", "HEAD"]).strip()
+            paths = run_command(local, ["git", "ls-files", "*.rst"]).splitlines()
+            with Timer() as legacy:
+                expected = legacy_mtimes(local, commit, paths)
+            with Timer() as walk:
+                actual = last_modified(local, commit)
+            assert actual == expected
+        print("{:>6} {:>10.2f} {:>10.2f}".format(docs, legacy.seconds, walk.seconds))
+
+
+if __name__ == "__main__":
+    main([int(i) for i in sys.argv[1:]] or [10, 100, 1000])
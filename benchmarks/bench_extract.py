@@ -0,0 +1,107 @@
+"""Compare extracting "git archive" output member by member with TarFile.extract() against the lexical fast path.
+
+The archive is synthetic and built in memory like "git archive" writes it (pax global header, a directory entry before
+its contents, mode 664 files) so only extraction is timed, not git. Both implementations extract the same archive to
+fresh directories and must produce the same files.
+
+Usage: python benchmarks/bench_extract.py [FILES ...]
+"""
+
+import io
+import logging
+import os
+import sys
+import tarfile
+import tempfile
+
+from common import EPOCH, Timer
+
+from sphinxcontrib_versioning.git import _extract_tar
+
+
+def make_archive(files):
+    """Build an uncompressed tar archive with files spread over two levels of directories, a third of them RST.
+
+    :param int files: Number of regular files.
+
+    :return: Archive contents.
+    :rtype: bytes
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT, pax_headers={"comment": "0" * 40}) as tar:
+        made = set()
+        for i in range(files):
+            directory = "docs/d{}/s{}".format(i % 100, i % 7)
+            parts = directory.split("/")
+            for depth in range(1, len(parts) + 1):
+                name = "/".join(parts[:depth])
+                if name not in made:
+                    info = tarfile.TarInfo(name + "/")
+                    info.type, info.mode, info.mtime = tarfile.DIRTYPE, 0o775, EPOCH
+                    tar.addfile(info)
+                    made.add(name)
+            content = "File {}\n{}\n".format(i, "=" * 60).encode("utf-8")
+            info = tarfile.TarInfo("{}/f{}.{}".format(directory, i, ("rst", "py", "png")[i % 3]))
+            info.size, info.mode, info.mtime = len(content), 0o664, EPOCH
+            tar.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def legacy_extract(stdout, target):
+    """Previous implementation: resolve every path on disk, format every debug line and use TarFile.extract()."""
+    log = logging.getLogger("legacy")
+    mtimes = list()
+    queued_links = list()
+    with tarfile.open(fileobj=stdout, mode="r|") as tar:
+        for info in tar:
+            log.debug("name: %s; mode: %d; size: %s; type: %s", info.name, info.mode, info.size, info.type)
+            path = os.path.realpath(os.path.join(target, info.name))
+            if not path.startswith(target):
+                log.warning("Ignoring tar object path %s outside of target directory.", info.name)
+            elif info.isdir():
+                if not os.path.exists(path):
+                    os.makedirs(path, mode=info.mode)
+            elif info.issym() or info.islnk():
+                queued_links.append(info)
+            else:
+                tar.extract(member=info, path=target)
+                if os.path.splitext(info.name)[1].lower() == ".rst":
+                    mtimes.append(info.name)
+        for info in queued_links:
+            tar.extract(member=info, path=target)
+    return mtimes
+
+
+def snapshot(target):
+    """Relative path, mode, mtime and contents of every file below target."""
+    result = dict()
+    for root, _, names in os.walk(target):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as handle:
+                stat = os.stat(path)
+                result[os.path.relpath(path, target)] = (stat.st_mode, int(stat.st_mtime), handle.read())
+    return result
+
+
+def main(sizes):
+    """Print one row per number of files."""
+    print("{:>8} {:>10} {:>10}".format("files", "legacy s", "fast s"))
+    for files in sizes:
+        archive = make_archive(files)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_dir = os.path.realpath(temp_dir)
+            legacy_target, fast_target = os.path.join(temp_dir, "legacy"), os.path.join(temp_dir, "fast")
+            os.makedirs(legacy_target)
+            os.makedirs(fast_target)
+            with Timer() as legacy:
+                expected = legacy_extract(io.BytesIO(archive), legacy_target)
+            with Timer() as fast:
+                actual = _extract_tar(io.BytesIO(archive), fast_target)
+            assert actual == expected
+            assert snapshot(fast_target) == snapshot(legacy_target)
+        print("{:>8} {:>10.2f} {:>10.2f}".format(files, legacy.seconds, fast.seconds))
+
+
+if __name__ == "__main__":
+    main([int(i) for i in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,66 @@
+"""Compare git processes spawned and time taken by filter_and_date() against one "git ls-tree" per ref.
+
+Usage: python benchmarks/bench_filter_and_date.py [REFS ...]
+"""
+
+import subprocess
+import sys
+import tempfile
+
+from common import make_repos, Timer
+
+from sphinxcontrib_versioning import git
+from sphinxcontrib_versioning.git import filter_and_date, list_remote, run_command
+
+
+def legacy_filter(local_root, conf_rel_paths, commits):
+    """Previous implementation: one "git ls-tree" per commit, then "git show" by groups of 50."""
+    found = dict()
+    for commit in commits:
+        output = run_command(
+            local_root, ["git", "ls-tree", "--name-only", "-r", commit] + conf_rel_paths
+        )
+        if output:
+            found[commit] = output.splitlines()[0]
+    found = list(found)
+    for i in range(0, len(found), 50):
+        run_command(local_root, ["git", "show", "--no-patch", "--pretty=format:%ct"] + found[i : i + 50])
+
+
+def count_processes(func, *args):
+    """Run func and return (seconds, number of processes started by sphinxcontrib_versioning.git)."""
+    calls = [0]
+    original = subprocess.Popen
+
+    def counting(*a, **kw):
+        calls[0] += 1
+        return original(*a, **kw)
+
+    git.Popen = counting
+    try:
+        with Timer() as timer:
+            func(*args)
+    finally:
+        git.Popen = original
+    return timer.seconds, calls[0]
+
+
+def main(sizes):
+    """Print one row per number of refs."""
+    print("{:>6} {:>16} {:>16}".format("refs", "legacy s/procs", "batched s/procs"))
+    for refs in sizes:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            local = make_repos(temp_dir, refs, docs=1, depth=max(refs, 1))
+            commits = [r[0] for r in list_remote(local)]
+            paths = ["conf.py", "docs/conf.py"]
+            legacy = count_processes(legacy_filter, local, paths, commits)
+            batched = count_processes(filter_and_date, local, paths, commits)
+        print(
+            "{:>6} {:>9.2f}/{:<6} {:>9.2f}/{:<6}".format(
+                refs, legacy[0], legacy[1], batched[0], batched[1]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main([int(i) for i in sys.argv[1:]] or [10, 100, 1000])
@@ -0,0 +1,75 @@
+"""Compare rendering the versions sidebar and banner for every page against reusing fragments rendered per depth.
+
+Runs Sphinx's html_page_context handler on synthetic pages only (no documents are read or written). Every version has
+the first N pages, N growing with the version, like a project that adds documents over time.
+
+Usage: python benchmarks/bench_render.py [PAGES [VERSIONS]]
+"""
+
+import sys
+import tempfile
+
+from common import Timer
+
+from sphinx.application import Sphinx
+
+from sphinxcontrib_versioning.sphinx_ import EventHandlers
+from sphinxcontrib_versioning.versions import Versions
+
+
+def make_versions(pages, count):
+    """Create a Versions instance where version i has the first pages * (i + 1) / count pages.
+
+    :param list pages: Page names.
+    :param int count: Number of versions.
+
+    :return: Versions class instance.
+    :rtype: sphinxcontrib_versioning.versions.Versions
+    """
+    versions = Versions(
+        ("", "v1.0.{}".format(i), "tags", "", i, "conf.py") for i in range(count)
+    )
+    for i, remote in enumerate(versions.remotes):
+        remote["found_docs"] = tuple(pages[: len(pages) * (i + 1) // count])
+    return versions
+
+
+def render_all(app, pages, cached):
+    """Run the html-page-context handler for every page.
+
+    :param sphinx.application.Sphinx app: Sphinx application object.
+    :param list pages: Page names.
+    :param bool cached: Reuse fragments between pages. Otherwise render them for every page like before.
+    """
+    EventHandlers.FRAGMENTS.clear()
+    for pagename in pages:
+        if not cached:
+            EventHandlers.FRAGMENTS.clear()
+        context = dict(project="Bench", pagename=pagename, body="<p>Body</p>")
+        EventHandlers.html_page_context(app, pagename, "page.html", context, None)
+
+
+def main(page_count, version_count):
+    """Print render times with and without the fragment cache."""
+    pages = ["/".join(["dir"] * (i % 4) + ["page{}".format(i)]) for i in range(page_count)]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with open("{}/conf.py".format(temp_dir), "w") as handle:
+            handle.write('extensions = ["sphinxcontrib_versioning.sphinx_"]\n')
+        app = Sphinx(temp_dir, temp_dir, temp_dir + "/_build", temp_dir + "/_doctrees", "html", status=None)
+        EventHandlers.BANNER_MAIN_VERSION = "v1.0.{}".format(version_count - 1)
+        EventHandlers.CURRENT_VERSION = "v1.0.0"
+        EventHandlers.SHOW_BANNER = True
+        EventHandlers.VERSIONS = make_versions(pages, version_count)
+
+        with Timer() as legacy:
+            render_all(app, pages, False)
+        with Timer() as fragments:
+            render_all(app, pages, True)
+
+    print("{} pages, {} versions".format(page_count, version_count))
+    print("{:>22} {:>8.2f} s".format("render every page", legacy.seconds))
+    print("{:>22} {:>8.2f} s ({} renders)".format("fragment cache", fragments.seconds, len(EventHandlers.FRAGMENTS)))
+
+
+if __name__ == "__main__":
+    main(*([int(i) for i in sys.argv[1:3]] + [5000, 20][len(sys.argv[1:3]) :]))
@@ -0,0 +1,133 @@
+"""Compare sorting many versions with the previous padded int lists against cached tuple keys.
+
+Tag names look like auto-tagged nightlies plus some releases and pre-releases. Each row sorts fresh copies of the
+remotes with both implementations and checks they agree.
+
+Usage: python benchmarks/bench_sort.py [TAGS ...]
+"""
+
+import random
+import sys
+
+from common import Timer
+
+from sphinxcontrib_versioning.versions import multi_sort, RE_SEMVER, Versions
+
+SORTS = (("semver",), ("alpha",), ("semver", "time"), ("time", "alpha"))
+
+
+def legacy_semvers(names):
+    """Previous implementation of semvers(): padded lists of ints."""
+    matches = [(RE_SEMVER.findall(n) or [[]])[0] for n in names]
+    max_len_ints = 0
+    max_len_str = 0
+
+    # Get max lens for padding.
+    for match in (m for m in matches if m):
+        max_len_ints = len(match)  # Never changes.
+        max_len_str = max(max_len_str, len(match[-1]))
+    if not max_len_ints:
+        return matches  # Nothing to do, all empty.
+    invalid_template = [1] + [0] * (max_len_ints + max_len_str - 1)
+
+    # Parse.
+    exploded_semver = list()
+    for match in matches:
+        if not match:
+            exploded_semver.append(invalid_template[:])
+            continue
+        version_ints = [-int(i or 0) for i in match[:-1]]
+        ints_of_str = [ord(i) for i in match[-1]] + [0] * (max_len_str - len(match[-1]))
+        exploded_semver.append([0] + version_ints + ints_of_str)
+
+    return exploded_semver
+
+
+def legacy_multi_sort(remotes, sort):
+    """Previous implementation of multi_sort(): per-remote key lists, alpha padded to the longest name."""
+    exploded_alpha = list()
+    exploded_semver = list()
+
+    # Convert name to int if alpha is in sort.
+    if "alpha" in sort:
+        alpha_max_len = max(len(r["name"]) for r in remotes)
+        for name in (r["name"] for r in remotes):
+            exploded_alpha.append(
+                [ord(i) for i in name] + [0] * (alpha_max_len - len(name))
+            )
+
+    # Parse versions if semver is in sort.
+    if "semver" in sort:
+        exploded_semver = legacy_semvers(r["name"] for r in remotes)
+
+    # Build sort_mapping dict.
+    sort_mapping = dict()
+    for i, remote in enumerate(remotes):
+        key = list()
+        for sort_by in sort:
+            if sort_by == "alpha":
+                key.extend(exploded_alpha[i])
+            elif sort_by == "time":
+                key.append(-remote["date"])
+            elif sort_by == "semver":
+                key.extend(exploded_semver[i])
+        sort_mapping[id(remote)] = key
+
+    # Sort.
+    remotes.sort(key=lambda k: sort_mapping.get(id(k)))
+
+
+def make_remotes(count):
+    """Create Versions.__init__() input with `count` tags and a few branches.
+
+    :param int count: Number of tags.
+
+    :return: List of tuples.
+    :rtype: list
+    """
+    rand = random.Random(count)
+    remotes = [("", "main", "heads", "", 0, "conf.py"), ("", "feature", "heads", "", 1, "conf.py")]
+    for i in range(count):
+        major, minor = divmod(i // 100, 10)
+        name = rand.choice(
+            [
+                "v{}.{}.{}".format(major, minor, i % 100),
+                "v{}.{}.0rc{}".format(major, minor, i % 5),
+                "nightly-{}".format(20160000 + i),
+                "v{}.{}.{}.dev{}".format(major, minor, i % 100, i),
+            ]
+        )
+        remotes.append(("", "{}-{}".format(name, i), "tags", "", rand.randrange(10 ** 9), "conf.py"))
+    return remotes
+
+
+def main(sizes):
+    """Print one row per number of tags."""
+    print("{:>7} {:<14} {:>9} {:>9} {:>9}".format("tags", "sort", "legacy s", "keys s", "cached s"))
+    for count in sizes:
+        remotes = Versions(make_remotes(count)).remotes
+        for sort in SORTS:
+            legacy, current = [dict(r) for r in remotes], [dict(r) for r in remotes]
+            for remote in current:
+                remote.pop("semver", None)  # Include computing keys in the time.
+            with Timer() as legacy_timer:
+                legacy_multi_sort(legacy, sort)
+            with Timer() as keys_timer:
+                multi_sort(current, sort)
+            assert [r["id"] for r in legacy] == [r["id"] for r in current]
+            current.reverse()
+            with Timer() as cached_timer:
+                multi_sort(current, sort)
+            print(
+                "{:>7} {:<14} {:>9.3f} {:>9.3f} {:>9.3f}".format(
+                    count, ",".join(sort), legacy_timer.seconds, keys_timer.seconds, cached_timer.seconds
+                )
+            )
+        remotes = make_remotes(count)
+        with Timer() as init_timer:
+            Versions(remotes, sort=("semver", "time"))
+        print("{:>7} {:<14} {:>9} {:>9.3f}".format(count, "Versions()", "", init_timer.seconds))
+
+
+if __name__ == "__main__":
+    main([int(i) for i in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,164 @@
+"""Time every stage of a build on a synthetic project and store the results to compare them across commits.
+
+Creates a bare "remote" repository with REFS branches/tags, DOCS documents and DEPTH commits of history and clones it
+over file:// (no network access needed). Then times list_remote(), filter_and_date(), export() of every commit,
+pre_build(), build_all() and rendering the versions list of every page of every version.
+
+Results are written as JSON to benchmarks/results/<commit>-<refs>r-<docs>d-<depth>c-<jobs>j.json (commit of this
+checkout, with "-dirty" if it has uncommitted changes). Pass --compare with a results file from an earlier commit to
+print both side by side.
+
+Usage: python benchmarks/bench_suite.py [--refs N] [--docs M] [--depth D] [--jobs J] [--compare FILE]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+
+import click
+import sphinx
+from common import git, make_repos, Timer
+
+from sphinxcontrib_versioning.git import export, filter_and_date, list_remote
+from sphinxcontrib_versioning.lib import Config
+from sphinxcontrib_versioning.routines import build_all, gather_git_info, pre_build
+from sphinxcontrib_versioning.versions import Versions
+
+CONF_REL_PATHS = ["docs/conf.py"]
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_ROOT, "benchmarks", "results")
+STAGES = ("list_remote", "filter_and_date", "export", "pre_build", "build_all", "render")
+
+
+def current_commit():
+    """Short SHA of the checked out commit of this project, with "-dirty" if there are uncommitted changes."""
+    commit = git(PROJECT_ROOT, "rev-parse", "--short", "HEAD").strip()
+    if git(PROJECT_ROOT, "status", "--porcelain", "--untracked-files=no").strip():
+        commit += "-dirty"
+    return commit
+
+
+def render(versions):
+    """Get the versions list of every page of every version, like the sidebar template does.
+
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance after pre_build().
+
+    :return: Number of pages.
+    :rtype: int
+    """
+    pages = 0
+    for remote in versions.remotes:
+        for pagename in remote["found_docs"]:
+            versions.context.update(
+                current_version=remote["name"], pagename=pagename, scv_is_root=False
+            )
+            list(versions)
+            pages += 1
+    return pages
+
+
+def run(args, temp_dir):
+    """Create the repositories and time all stages.
+
+    :param argparse.Namespace args: Command line arguments.
+    :param str temp_dir: Empty directory for repositories and output.
+
+    :return: Seconds keyed by stage name, and number of pages rendered.
+    :rtype: tuple
+    """
+    local = make_repos(temp_dir, refs=args.refs, docs=args.docs, depth=args.depth)
+    seconds = dict()
+
+    with Timer() as timer:
+        remotes = list_remote(local)
+    seconds["list_remote"] = timer.seconds
+
+    with Timer() as timer:
+        filter_and_date(local, CONF_REL_PATHS, [r[0] for r in remotes])
+    seconds["filter_and_date"] = timer.seconds
+
+    shas = sorted({r[0] for r in remotes})
+    with Timer() as timer:
+        for sha in shas:
+            export(local, sha, os.path.join(temp_dir, "export", sha))
+    seconds["export"] = timer.seconds
+    shutil.rmtree(os.path.join(temp_dir, "export"))
+
+    config = Config()
+    config.update(dict(jobs=args.jobs, overflow=("-q",), root_ref="main"))
+    with click.Context(click.Command("bench"), obj=config):
+        versions = Versions(gather_git_info(local, CONF_REL_PATHS, (), ()))
+        with Timer() as timer:
+            exported_root = pre_build(local, versions)
+        seconds["pre_build"] = timer.seconds
+
+        with Timer() as timer:
+            build_all(exported_root, os.path.join(temp_dir, "html"), versions)
+        seconds["build_all"] = timer.seconds
+        shutil.rmtree(exported_root)
+
+    with Timer() as timer:
+        pages = render(versions)
+    seconds["render"] = timer.seconds
+    return seconds, pages
+
+
+def main():
+    """Run the benchmark, store the results and print them."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--refs", type=int, default=20, help="Branches and tags besides main.")
+    parser.add_argument("--docs", type=int, default=50, help="Documents in every version.")
+    parser.add_argument("--depth", type=int, default=100, help="Commits of history.")
+    parser.add_argument("--jobs", type=int, default=1, help="Passed to build_all() as --jobs.")
+    parser.add_argument("--compare", help="Earlier results file to print next to these.")
+    parser.add_argument("--output", default=RESULTS_DIR, help="Directory to store results in.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        seconds, pages = run(args, temp_dir)
+    results = dict(
+        commit=current_commit(),
+        date=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        pages=pages,
+        params=dict(depth=args.depth, docs=args.docs, jobs=args.jobs, refs=args.refs),
+        platform=platform.platform(),
+        python=platform.python_version(),
+        seconds={k: round(v, 4) for k, v in seconds.items()},
+        sphinx=sphinx.__version__,
+    )
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(
+        args.output,
+        "{commit}-{refs}r-{docs}d-{depth}c-{jobs}j.json".format(commit=results["commit"], **results["params"]),
+    )
+    with open(path, "w") as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+
+    other = None
+    if args.compare:
+        with open(args.compare) as handle:
+            other = json.load(handle)
+        if other["params"] != results["params"]:
+            print("Warning: compared results used different parameters: {}".format(other["params"]), file=sys.stderr)
+
+    print("{refs} refs, {docs} docs, {depth} commits, {jobs} jobs ({0} pages)".format(pages, **results["params"]))
+    if other:
+        print("{:>16} {:>12} {:>12} {:>8}".format("stage", results["commit"], other["commit"], "ratio"))
+    else:
+        print("{:>16} {:>12}".format("stage", results["commit"]))
+    for stage in STAGES:
+        line = "{:>16} {:>12.3f}".format(stage, seconds[stage])
+        if other and stage in other["seconds"]:
+            theirs = other["seconds"][stage]
+            line += " {:>12.3f} {:>8}".format(theirs, "{:.2f}x".format(seconds[stage] / theirs) if theirs else "-")
+        print(line)
+    print("Results written to {}".format(os.path.relpath(path)))
+
+
+if __name__ == "__main__":
+    main()
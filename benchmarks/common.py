@@ -0,0 +1,126 @@
+"""Helpers shared by the benchmark scripts in this directory. Not part of the installed package.
+
+Run scripts from the project root, e.g.: python benchmarks/bench_filter_and_date.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+EPOCH = 1480900000  # Dec 2016, same era as tests/conftest.py ROOT_TS.
+
+
+def git(directory, *args, **kwargs):
+    """Run a git command in directory and return its stdout.
+
+    :param str directory: Working directory.
+    :param iter args: Arguments after "git".
+    :param dict kwargs: Passed to subprocess.run().
+
+    :return: Command output.
+    :rtype: str
+    """
+    result = subprocess.run(
+        ("git",) + args,
+        cwd=directory,
+        check=True,
+        stdout=subprocess.PIPE,
+        **kwargs,
+    )
+    return result.stdout.decode("utf-8")
+
+
+def fast_import_stream(refs, docs, depth):
+    """Generate a "git fast-import" stream of a project with Sphinx docs.
+
+    History is a single line of `depth` commits on main. Every commit touches conf.py and one document (round robin).
+    Refs are spread evenly over the history: tags named v1.0.<n> and the rest as branches named branch<n>.
+
+    :param int refs: Number of branches and tags besides main (about half of each).
+    :param int docs: Number of .rst documents besides contents.rst.
+    :param int depth: Number of commits on main.
+
+    :return: Stream to feed to stdin of "git fast-import".
+    :rtype: bytes
+    """
+    depth = max(depth, 1)
+    chunks = list()
+
+    def data(content):
+        """Serialize a data block."""
+        encoded = content.encode("utf-8")
+        chunks.append(b"data %d\n" % len(encoded) + encoded + b"\n")
+
+    toctree = "".join("    doc{}\n".format(i) for i in range(docs))
+    for commit in range(depth):
+        chunks.append(b"commit refs/heads/main\nmark :%d\n" % (commit + 1))
+        chunks.append(b"committer Bench <bench@localhost> %d +0000\n" % (EPOCH + commit * 60))
+        data("Commit {}.".format(commit))
+        if commit:
+            chunks.append(b"from :%d\n" % commit)
+        if not commit:
+            data_files = {
+                "docs/contents.rst": "Test\n====\n\n.. toctree::\n{}".format(toctree)
+            }
+            data_files.update(
+                ("docs/doc{}.rst".format(i), "Doc {0}\n=====\n\nText.\n".format(i))
+                for i in range(docs)
+            )
+        else:
+            data_files = dict()
+            if docs:
+                i = commit % docs
+                data_files["docs/doc{}.rst".format(i)] = "Doc {0}\n=====\n\nCommit {1}.\n".format(i, commit)
+        data_files["docs/conf.py"] = 'master_doc = "contents"\n# {}\n'.format(commit)
+        for path, content in sorted(data_files.items()):
+            chunks.append("M 100644 inline {}\n".format(path).encode("utf-8"))
+            data(content)
+        chunks.append(b"\n")
+
+    for ref in range(refs):
+        commit = depth - (ref * depth // refs if refs else 0)
+        name = "tags/v1.0.{}".format(ref) if ref % 2 else "heads/branch{}".format(ref)
+        chunks.append("reset refs/{}\nfrom :{}\n\n".format(name, commit).encode("utf-8"))
+
+    return b"".join(chunks)
+
+
+def make_repos(directory, refs, docs, depth):
+    """Create a bare "remote" repository and a clone of it with the synthetic project.
+
+    :param str directory: Empty directory to create "remote" and "local" in.
+    :param int refs: Number of branches and tags besides main.
+    :param int docs: Number of .rst documents besides contents.rst.
+    :param int depth: Number of commits on main.
+
+    :return: Path to the local clone.
+    :rtype: str
+    """
+    remote = os.path.join(directory, "remote")
+    local = os.path.join(directory, "local")
+    os.makedirs(remote)
+    git(remote, "init", "--bare", "--quiet")
+    git(remote, "fast-import", "--quiet", input=fast_import_stream(refs, docs, depth))
+    git(directory, "clone", "--quiet", "file://" + remote, local)
+    return local
+
+
+class Timer(object):
+    """Context manager measuring wall time in seconds."""
+
+    def __init__(self):
+        """Constructor."""
+        self.seconds = 0.0
+        self._start = None
+
+    def __enter__(self):
+        """Start timer."""
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        """Stop timer."""
+        self.seconds = time.perf_counter() - self._start
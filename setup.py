@@ -68,8 +68,12 @@ if __name__ == "__main__":
         package_data={
             "": [
                 os.path.join("_static", "banner.css"),
+                os.path.join("_static_json", "versions.js"),
                 os.path.join("_templates", "banner.html"),
                 os.path.join("_templates", "layout.html"),
+                os.path.join("_templates", "scv_banner_json.html"),
+                os.path.join("_templates", "scv_versions.html"),
+                os.path.join("_templates", "scv_versions_json.html"),
                 os.path.join("_templates", "versions.html"),
             ]
         },
@@ -10,12 +10,15 @@ import click
 
 from sphinxcontrib_versioning import __version__
 from sphinxcontrib_versioning.git import clone, commit_and_push, get_root, GitError
-from sphinxcontrib_versioning.lib import Config, HandledError, TempDir
+from sphinxcontrib_versioning.lib import Config, HandledError, TempDir, TIMINGS
 from sphinxcontrib_versioning.routines import (
     build_all,
     gather_git_info,
     pre_build,
     read_local_conf,
+    read_state,
+    write_state,
+    write_timings,
 )
 from sphinxcontrib_versioning.setup_logging import setup_logging
 from sphinxcontrib_versioning.versions import multi_sort, Versions
@@ -250,9 +253,57 @@ def build_options(func):
         "--banner-main-ref",
         help="Don't show banner on this ref and point banner URLs to this ref. Default master.",
     )(func)
+    func = click.option(
+        "-C",
+        "--cache-dir",
+        type=click.Path(file_okay=False, dir_okay=True),
+        help="Reuse output of versions that haven't changed since the last build. Cache is stored here.",
+    )(func)
+    func = click.option(
+        "-e",
+        "--sparse-export",
+        is_flag=True,
+        help="Only export the directory with conf.py and --export-path paths instead of the whole repo.",
+    )(func)
+    func = click.option(
+        "-E",
+        "--export-path",
+        "export_paths",
+        multiple=True,
+        help="Also export this file/directory (relative to git root) with --sparse-export. Can be specified more than once.",
+    )(func)
+    func = click.option(
+        "-f",
+        "--profile-dir",
+        type=click.Path(file_okay=False, dir_okay=True),
+        help="Profile every sphinx-build child process and write pstats files named after the branch/tag here.",
+    )(func)
+    func = click.option(
+        "-F",
+        "--fetch-filter",
+        help="Fetch missing commits without objects matching this filter (e.g. blob:none) as a partial clone.",
+    )(func)
     func = click.option(
         "-i", "--invert", help="Invert/reverse order of versions.", is_flag=True
     )(func)
+    func = click.option(
+        "-j",
+        "--jobs",
+        type=click.IntRange(min=1),
+        help="Run up to this many sphinx-build processes at the same time. Default 1.",
+    )(func)
+    func = click.option(
+        "-J",
+        "--versions-json",
+        is_flag=True,
+        help="Write versions.json to DESTINATION and list versions in the browser instead of in every HTML page.",
+    )(func)
+    func = click.option(
+        "-M",
+        "--max-worker-jobs",
+        type=click.IntRange(min=1),
+        help="Reuse sphinx-build processes for up to this many builds each. Default 1 (new process every build).",
+    )(func)
     func = click.option(
         "-p",
         "--priority",
@@ -264,6 +315,12 @@ def build_options(func):
         "--root-ref",
         help="The branch/tag at the root of DESTINATION. Will also be in subdir. Default master.",
     )(func)
+    func = click.option(
+        "-R",
+        "--timings",
+        type=click.Path(file_okay=True, dir_okay=False),
+        help="Write wall time, CPU time and peak memory of each phase and branch/tag to this JSON file.",
+    )(func)
     func = click.option(
         "-s",
         "--sort",
@@ -283,6 +340,12 @@ def build_options(func):
         is_flag=True,
         help="Override root-ref to be the most recent committed tag.",
     )(func)
+    func = click.option(
+        "-u",
+        "--changed-only",
+        is_flag=True,
+        help="Only build branches/tags that changed since the last build into DESTINATION.",
+    )(func)
     func = click.option(
         "-w",
         "--whitelist-branches",
@@ -295,6 +358,12 @@ def build_options(func):
         multiple=True,
         help="Whitelist tags that match the pattern. Can be specified more than once.",
     )(func)
+    func = click.option(
+        "-x",
+        "--export-jobs",
+        type=click.IntRange(min=1),
+        help="Export up to this many commits from git at the same time. Default 1.",
+    )(func)
 
     return func
 
@@ -365,15 +434,18 @@ def build(config, rel_source, destination, **options):
         raise RuntimeError(config, rel_source, destination)
     log = logging.getLogger(__name__)
 
+    TIMINGS.reset()
+
     # Gather git data.
     log.info("Gathering info about the remote git repository...")
     conf_rel_paths = [os.path.join(s, "conf.py") for s in rel_source]
-    remotes = gather_git_info(
-        config.git_root,
-        conf_rel_paths,
-        config.whitelist_branches,
-        config.whitelist_tags,
-    )
+    with TIMINGS.measure("gather"):
+        remotes = gather_git_info(
+            config.git_root,
+            conf_rel_paths,
+            config.whitelist_branches,
+            config.whitelist_tags,
+        )
     if not remotes:
         log.error("No docs found in any remote branch/tag. Nothing to do.")
         raise HandledError
@@ -421,10 +493,17 @@ def build(config, rel_source, destination, **options):
     else:
         log.info("Banner main ref is: %s", config.banner_main_ref)
 
+    # Find versions already built.
+    unchanged = read_state(destination, versions) if config.changed_only else None
+
     # Pre-build.
     log.info("Pre-running Sphinx to collect versions' master_doc and other info.")
     exported_root = pre_build(
-        config.git_root, versions, config.use_master_conf, config.use_master_templates
+        config.git_root,
+        versions,
+        config.use_master_conf,
+        config.use_master_templates,
+        unchanged,
     )
     if config.banner_main_ref and config.banner_main_ref not in [
         r["name"] for r in versions.remotes
@@ -444,11 +523,16 @@ def build(config, rel_source, destination, **options):
         )
 
     # Build.
-    build_all(exported_root, destination, versions)
+    with TIMINGS.measure("build"):
+        build_all(exported_root, destination, versions, unchanged)
+    if unchanged is not None:
+        write_state(destination, versions, unchanged)
 
     # Cleanup.
     log.debug("Removing: %s", exported_root)
     shutil.rmtree(exported_root)
+    if config.timings:
+        write_timings(config.timings, versions)
 
     # Store versions in state for push().
     config["versions"] = versions
@@ -0,0 +1,105 @@
+/* Populate the versions sidebar and banner from versions.json in the root of the destination directory.
+ *
+ * Used with --versions-json so HTML pages don't change when other versions are added or removed. Page specific
+ * values are in meta tags added by sphinxcontrib_versioning.sphinx_.EventHandlers.html_page_context().
+ */
+(function () {
+    "use strict";
+
+    function meta(name) {
+        var element = document.querySelector('meta[name="scv-' + name + '"]');
+        return element ? element.getAttribute("content") : null;
+    }
+
+    /* Same as FoundDocs.__contains__() in sphinxcontrib_versioning/versions.py. */
+    function hasPage(version, page) {
+        if (page.position === -1) {
+            return false;
+        }
+        var bitmap = atob(version.found_docs);
+        return (bitmap.charCodeAt(page.position >> 3) & (1 << (page.position & 7))) !== 0;
+    }
+
+    /* Same as Versions.vhasdoc() and Versions.vpathto() in sphinxcontrib_versioning/versions.py. */
+    function link(version, page) {
+        var exists = version.name === page.current || hasPage(version, page);
+        if (version.name === page.current && !page.isRoot) {
+            return {exists: true, url: page.name.split("/").pop() + ".html"};
+        }
+        var prefix = new Array(page.name.split("/").length).join("../") + (page.isRoot ? "" : "../");
+        return {exists: exists, url: prefix + version.root_dir + "/" + (exists ? page.name : version.master_doc) + ".html"};
+    }
+
+    function anchor(url, content) {
+        var element = document.createElement("a");
+        element.setAttribute("href", url);
+        element.innerHTML = content;
+        return element;
+    }
+
+    function sidebar(container, manifest, page) {
+        [["tags", "Tags"], ["heads", "Branches"]].forEach(function (kind) {
+            var versions = manifest.versions.filter(function (v) { return v.kind === kind[0]; });
+            if (!versions.length) {
+                return;
+            }
+            var list = document.createElement("dl");
+            list.appendChild(document.createElement("dt")).textContent = kind[1];
+            versions.forEach(function (version) {
+                var item = list.appendChild(document.createElement("dd"));
+                item.appendChild(anchor(link(version, page).url, "")).textContent = version.name;
+            });
+            container.appendChild(list);
+        });
+    }
+
+    function banner(element, manifest, page) {
+        var main = manifest.banner && manifest.versions.filter(function (v) {
+            return v.name === manifest.banner.main_version;
+        })[0];
+        if (!main || main.name === page.current) {
+            return;
+        }
+        var project = document.createElement("span");
+        project.textContent = element.getAttribute("data-project");
+        var message = "<b>Warning:</b> This document is for " +
+            (element.getAttribute("data-is-branch") === "true" ? "the development version" : "an old version") +
+            " of " + project.innerHTML + ".";
+        var target = link(main, page);
+        if (target.exists) {
+            var name = document.createElement("span");
+            name.textContent = main.name;
+            message += " The " + (main.kind === "tags" ? "latest" : "main") + " version is " + name.innerHTML + ".";
+            element.appendChild(anchor(target.url, message));
+        } else {
+            element.innerHTML = message;
+        }
+        element.hidden = false;
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        var container = document.getElementById("scv-other-versions");
+        var element = document.getElementById("scv-banner");
+        var url = meta("versions-json");
+        if (!url || (!container && !element)) {
+            return;
+        }
+        var page = {current: meta("current-version"), isRoot: meta("is-root") === "true", name: meta("pagename")};
+        var request = new XMLHttpRequest();
+        request.open("GET", url);
+        request.responseType = "json";
+        request.onload = function () {
+            if (request.status !== 200 || !request.response) {
+                return;
+            }
+            page.position = request.response.pages.indexOf(page.name);
+            if (container) {
+                sidebar(container, request.response, page);
+            }
+            if (element) {
+                banner(element, request.response, page);
+            }
+        };
+        request.send();
+    });
+}());
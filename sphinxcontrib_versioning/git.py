@@ -1,23 +1,34 @@
 """Interface with git locally and remotely."""
 
+import functools
 import glob
+import itertools
 import json
 import logging
 import os
+import posixpath
 import re
+import shutil
 import sys
 import tarfile
+import tempfile
 import time
 from datetime import datetime
 from subprocess import CalledProcessError, PIPE, Popen, STDOUT
 
+from sphinxcontrib_versioning.lib import TIMINGS
+
 IS_WINDOWS = sys.platform == "win32"
+RE_BATCH_CHECK = re.compile(r"^[0-9a-f]{40,64} (\w+) \d+$")
 RE_ALL_REMOTES = re.compile(r"([\w./-]+)\t([A-Za-z0-9@:/\\._-]+) \((fetch|push)\)\n")
 RE_REMOTE = re.compile(
     r"^(?P<sha>[0-9a-f]{5,40})\trefs/(?P<kind>heads|tags)/(?P<name>[\w./-]+(?:\^\{})?)$",
     re.MULTILINE,
 )
+RE_OBJECT_ID = re.compile(r"^[0-9a-f]{40,64}$", re.MULTILINE)
 RE_UNIX_TIME = re.compile(r"^\d{10}$", re.MULTILINE)
+STORE_MODE = 0o444  # Blob store files, see _store_blobs().
+STORE_MODE_EXECUTABLE = 0o555
 WHITELIST_ENV_VARS = (
     "APPVEYOR",
     "APPVEYOR_ACCOUNT_NAME",
@@ -93,28 +104,9 @@ class GitError(Exception):
         super(GitError, self).__init__(message, output)
 
 
-def chunk(iterator, max_size):
-    """Chunk a list/set/etc.
-
-    :param iter iterator: The iterable object to chunk.
-    :param int max_size: Max size of each chunk. Remainder chunk may be smaller.
-
-    :return: Yield list of items.
-    :rtype: iter
-    """
-    gen = iter(iterator)
-    while True:
-        chunked = list()
-        for i, item in enumerate(gen):
-            chunked.append(item)
-            if i >= max_size - 1:
-                break
-        if not chunked:
-            return
-        yield chunked
-
-
-def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ=None):
+def run_command(
+    local_root, command, env_var=True, pipeto=None, retry=0, environ=None, stdin=None
+):
     """Run a command and return the output.
 
     :raise CalledProcessError: Command exits non-zero.
@@ -125,6 +117,7 @@ def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ
     :param bool env_var: Define GIT_DIR environment variable (on non-Windows).
     :param function pipeto: Pipe `command`'s stdout to this function (only parameter given).
     :param int retry: Retry this many times on CalledProcessError after 0.1 seconds.
+    :param str stdin: Write this to the command's stdin.
 
     :return: Command output.
     :rtype: str
@@ -141,14 +134,17 @@ def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ
         env.pop("GIT_DIR", None)
 
     # Run command.
-    with open(os.devnull) as null:
+    with open(os.devnull) as null, tempfile.TemporaryFile() as stdin_file:
+        if stdin is not None:  # From a file so large inputs can't deadlock with pipeto.
+            stdin_file.write(stdin.encode("utf-8"))
+            stdin_file.seek(0)
         main = Popen(
             command,
             cwd=local_root,
             env=env,
             stdout=PIPE,
             stderr=PIPE if pipeto else STDOUT,
-            stdin=null,
+            stdin=null if stdin is None else stdin_file,
         )
         if pipeto:
             pipeto(main.stdout)
@@ -168,7 +164,9 @@ def run_command(local_root, command, env_var=True, pipeto=None, retry=0, environ
         if retry < 1:
             raise CalledProcessError(main.poll(), command, output=main_output)
         time.sleep(0.1)
-        return run_command(local_root, command, env_var, pipeto, retry - 1)
+        return run_command(
+            local_root, command, env_var, pipeto, retry - 1, environ, stdin
+        )
 
     return main_output
 
@@ -239,6 +237,10 @@ def list_remote(local_root):
 def filter_and_date(local_root, conf_rel_paths, commits):
     """Get commit Unix timestamps and first matching conf.py path. Exclude commits with no conf.py file.
 
+    Runs a fixed number of git processes no matter how many commits are given. All lookups are piped into a single
+    "git cat-file --batch-check" and all timestamps are read by a single "git log --no-walk --stdin".
+    In a partial clone the conf.py files are fetched first, all at once.
+
     :raise CalledProcessError: Unhandled git command failure.
     :raise GitError: A commit SHA has not been fetched.
 
@@ -249,79 +251,492 @@ def filter_and_date(local_root, conf_rel_paths, commits):
     :return: Commit time (seconds since Unix epoch) for each commit and conf.py path. SHA keys and [int, str] values.
     :rtype: dict
     """
+    commits = list(dict.fromkeys(commits))  # Remove duplicates, keep order.
+    conf_rel_paths = sorted(conf_rel_paths)
     dates_paths = dict()
-
-    # Filter without docs.
+    if not commits:
+        return dates_paths
+
+    # Fetch conf.py files missing from a partial clone at once instead of one at a time when looked up below.
+    fetch_missing(local_root, commits, conf_rel_paths)
+
+    # Filter without docs. Query each commit itself first then each candidate path in it.
+    queries = [
+        q
+        for c in commits
+        for q in ["{}^{{commit}}".format(c)]
+        + ["{}:{}".format(c, p) for p in conf_rel_paths]
+    ]
+    output = run_command(
+        local_root,
+        ["git", "cat-file", "--batch-check"],
+        stdin="\n".join(queries) + "\n",
+    )
+    answers = iter(output.splitlines())
     for commit in commits:
-        if commit in dates_paths:
-            continue
-        command = ["git", "ls-tree", "--name-only", "-r", commit] + conf_rel_paths
-        try:
-            output = run_command(local_root, command)
-        except CalledProcessError as exc:
-            raise GitError("Git ls-tree failed on {0}".format(commit), exc.output)
-        if output:
-            dates_paths[commit] = [None, output.splitlines()[0].strip()]
-
-    # Get timestamps by groups of 50.
-    command_prefix = ["git", "show", "--no-patch", "--pretty=format:%ct"]
-    for commits_group in chunk(dates_paths, 50):
-        command = command_prefix + commits_group
-        output = run_command(local_root, command)
+        if not RE_BATCH_CHECK.match(next(answers)):
+            raise GitError("Git failed to find commit {0}".format(commit), output)
+        types = [
+            (RE_BATCH_CHECK.findall(a) or [None])[0]
+            for a in itertools.islice(answers, len(conf_rel_paths))
+        ]
+        found = [p for p, t in zip(conf_rel_paths, types) if t == "blob"]
+        if found:
+            dates_paths[commit] = [None, found[0]]
+
+    # Get timestamps.
+    if dates_paths:
+        command = ["git", "log", "--no-walk=unsorted", "--stdin", "--pretty=format:%ct"]
+        output = run_command(local_root, command, stdin="\n".join(dates_paths) + "\n")
         timestamps = [int(i) for i in RE_UNIX_TIME.findall(output)]
-        for i, commit in enumerate(commits_group):
+        for i, commit in enumerate(dates_paths):
             dates_paths[commit][0] = timestamps[i]
 
     # Done.
     return dates_paths
 
 
-def fetch_commits(local_root, remotes):
-    """Fetch from origin.
+def missing_commits(local_root, commits):
+    """Find commits that haven't been fetched yet using a single git process.
 
     :raise CalledProcessError: Unhandled git command failure.
 
     :param str local_root: Local path to git root directory.
-    :param iter remotes: Output of list_remote().
+    :param iter commits: List of commit SHAs.
+
+    :return: Missing commit SHAs, in the same order.
+    :rtype: list
     """
-    # Fetch all known branches.
-    command = ["git", "fetch", "origin"]
-    run_command(local_root, command)
+    commits = list(dict.fromkeys(commits))  # Remove duplicates, keep order.
+    if not commits:
+        return commits
+    output = run_command(
+        local_root,
+        ["git", "cat-file", "--batch-check"],
+        environ=dict(GIT_NO_LAZY_FETCH="1"),  # Don't fetch one by one from a partial clone's remote.
+        stdin="".join("{}^{{commit}}\n".format(c) for c in commits),
+    )
+    return [c for c, l in zip(commits, output.splitlines()) if not RE_BATCH_CHECK.match(l)]
+
+
+@functools.lru_cache(maxsize=None)
+def is_partial_clone(local_root):
+    """Check if the local repository is a partial clone (e.g. "git clone --filter=blob:none").
+
+    :param str local_root: Local path to git root directory.
+
+    :return: If any remote is a promisor remote, one git fetches filtered out objects from on demand.
+    :rtype: bool
+    """
+    command = ["git", "config", "--bool", "--get-regexp", r"^remote\..*\.promisor$"]
+    try:
+        output = run_command(local_root, command)
+    except CalledProcessError:  # Exit 1 when nothing matches.
+        return False
+    return " true" in output
+
 
-    # Fetch new branches/tags.
-    for sha, name, kind, sha8 in remotes:
+def _fetch_objects(local_root, objects):
+    """Fetch objects by id from origin in one "git fetch", like git does for a single object missing in a partial clone.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param iter objects: Object ids (trees and blobs).
+    """
+    command = [
+        "git",
+        "-c",
+        "fetch.negotiationAlgorithm=noop",
+        "fetch",
+        "origin",
+        "--no-tags",
+        "--no-write-fetch-head",
+        "--recurse-submodules=no",
+        "--filter=blob:none",
+        "--stdin",
+    ]
+    run_command(local_root, command, stdin="".join(o + "\n" for o in objects))
+
+
+def fetch_missing(local_root, commits, paths=None):
+    """Fetch trees and blobs below paths at commits that are missing from a partial clone, in one "git fetch".
+
+    Otherwise git fetches them on demand, one round trip per file. Walks the commits' root trees instead of the commits
+    so git doesn't read parent trees to simplify history by paths. Root trees missing from a treeless clone are fetched
+    first. Does nothing in a regular clone. Commits that haven't been fetched yet are ignored.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param iter commits: List of commit SHAs.
+    :param iter paths: Only fetch objects below these paths (relative to the git root). None fetches everything.
+    """
+    log = logging.getLogger(__name__)
+    commits = list(dict.fromkeys(commits))  # Remove duplicates, keep order.
+    if not commits or not is_partial_clone(local_root):
+        return
+    output = run_command(
+        local_root,
+        [
+            "git",
+            "rev-list",
+            "--no-walk",
+            "--ignore-missing",
+            "--missing=allow-any",  # Don't try to fetch unfetched commits one by one.
+            "--stdin",
+            "--format=%T",
+        ],
+        stdin="".join(c + "\n" for c in commits),
+    )
+    trees = RE_OBJECT_ID.findall(output)  # Skips "commit <sha>" header lines.
+    if not trees:
+        return
+
+    command = ["git", "rev-list", "--objects", "--missing=print", "--stdin"]
+    if paths is not None:
+        command += ["--"] + list(paths)
+    fetched = set()
+    while True:
         try:
-            run_command(local_root, ["git", "reflog", sha])
-        except CalledProcessError:
-            run_command(local_root, command + ["refs/{0}/{1}".format(kind, name)])
-            run_command(local_root, ["git", "reflog", sha])
+            output = run_command(
+                local_root, command, stdin="".join(t + "\n" for t in trees)
+            )
+        except CalledProcessError:  # Root trees missing too.
+            missing = trees
+        else:
+            missing = [line[1:] for line in output.splitlines() if line[:1] == "?"]
+        missing = [m for m in missing if m not in fetched]
+        if not missing:
+            return
+        log.debug("Fetching %d missing objects of %d commits.", len(missing), len(commits))
+        _fetch_objects(local_root, missing)  # Trees come with their subtrees, so more blobs may be missing now.
+        fetched.update(missing)
 
 
-def export(local_root, commit, target):
-    """Export git commit to directory. "Extracts" all files at the commit to the target directory.
+def fetch_commits(local_root, remotes, blob_filter=None):
+    """Fetch missing commits from origin.
 
-    Set mtime of RST files to last commit date.
+    Finds commits missing locally with one batch query and fetches the refs pointing to them with one "git fetch". Refs
+    whose commits are already available aren't fetched at all.
 
     :raise CalledProcessError: Unhandled git command failure.
 
     :param str local_root: Local path to git root directory.
-    :param str commit: Git commit SHA to export.
-    :param str target: Directory to export to.
+    :param iter remotes: Output of list_remote().
+    :param str blob_filter: Fetch without objects matching this filter (e.g. blob:none), making the local repository
+        a partial clone. Git fetches filtered objects on demand afterwards.
     """
     log = logging.getLogger(__name__)
-    target = os.path.realpath(target)
-    mtimes = list()
+    remotes = list(remotes)
+    missing = set(missing_commits(local_root, (r[0] for r in remotes)))
+    if not missing:
+        log.debug("All %d commits already fetched.", len(remotes))
+        return
+    refspecs = list(
+        dict.fromkeys(
+            "refs/{0}/{1}".format(kind, name)
+            for sha, name, kind, _ in remotes
+            if sha in missing
+        )
+    )
+    log.debug("Fetching %d refs for %d missing commits.", len(refspecs), len(missing))
 
-    # Define extract function.
-    def extract(stdout):
-        """Extract tar archive from "git archive" stdout.
+    command = ["git", "fetch", "--no-tags", "origin"]
+    if blob_filter:
+        command.insert(2, "--filter={}".format(blob_filter))
+    run_command(local_root, command + refspecs)
+    if blob_filter:
+        is_partial_clone.cache_clear()  # Fetching with a filter makes origin a promisor remote.
+
+
+@functools.lru_cache(maxsize=None)
+def last_modified(local_root, commit):
+    """Get the last commit date of every RST file at a commit, walking history only once.
+
+    Parses one "git log --name-only" stream incrementally instead of running "git log -n1" for each file. Results are
+    cached per commit since the root ref is usually exported more than once.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA.
+
+    :return: Unix timestamps of the last commit touching each file, keyed by relative path.
+    :rtype: dict
+    """
+    last_committed = dict()
+
+    def parse(stdout):
+        """Read NUL separated "git log -z" output. Headers start with byte 1, file names follow.
 
         :param file stdout: Handle to git's stdout pipe.
         """
-        queued_links = list()
-        try:
-            with tarfile.open(fileobj=stdout, mode="r|") as tar:
-                for info in tar:
+        timestamp, buffer = None, b""
+        for chunk in iter(lambda: stdout.read(65536), b""):
+            records = (buffer + chunk).split(b"\0")
+            buffer = records.pop()
+            for record in records:
+                if record.startswith(b"\x01"):
+                    timestamp = int(record[1:])
+                    continue
+                if record.startswith(b"\n"):  # First file name after a header.
+                    record = record[1:]
+                path = record.decode("utf-8", "surrogateescape")
+                if path and path not in last_committed:
+                    last_committed[path] = timestamp
+
+    run_command(
+        local_root,
+        [
+            "git",
+            "log",
+            "-z",
+            "--name-only",
+            "--format=%x01%at",
+            commit,
+            "--",
+            ":(icase)*.rst",
+        ],
+        pipeto=parse,
+    )
+    return last_committed
+
+
+def _store_existing(path):
+    """Check if a blob store file exists, making it read-only if it isn't.
+
+    :param str path: Blob store file.
+
+    :return: If it exists.
+    :rtype: bool
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return False
+    if mode & 0o222:
+        os.chmod(path, mode & ~0o222)
+    return True
+
+
+def _store_blobs(local_root, blob_store, blobs):
+    """Write git blobs missing from the blob store with a single "git cat-file --batch".
+
+    Files are written to a temporary name first and renamed so concurrent runs sharing a store never see partial files.
+    They are read-only since they are hard linked into exported trees: a Sphinx extension writing to a source file in
+    place (instead of replacing it) fails rather than changing it in every tree sharing the blob, in all later runs.
+    Entries written by older versions of this function are made read-only too.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str blob_store: Directory holding one file per blob, named by blob id.
+    :param iter blobs: Blob ids to look up.
+    """
+    missing = [b for b in blobs if not _store_existing(os.path.join(blob_store, b))]
+    if not missing:
+        return
+
+    def write(stdout):
+        """Read objects from "git cat-file --batch" stdout and write them to the blob store.
+
+        :param file stdout: Handle to git's stdout pipe.
+        """
+        for header in iter(stdout.readline, b""):
+            blob, _, size = header.decode("ascii").split()
+            handle, temp_path = tempfile.mkstemp(".tmp", dir=blob_store)
+            with os.fdopen(handle, "wb") as temp_file:
+                remaining = int(size)
+                while remaining:
+                    chunk = stdout.read(min(remaining, 1048576))
+                    temp_file.write(chunk)
+                    remaining -= len(chunk)
+            stdout.read(1)  # Trailing newline.
+            os.chmod(temp_path, STORE_MODE)
+            os.replace(temp_path, os.path.join(blob_store, blob))
+
+    run_command(
+        local_root,
+        ["git", "cat-file", "--batch"],
+        pipeto=write,
+        stdin="".join(b + "\n" for b in missing),
+    )
+
+
+def _store_variant(source, suffix, mode=None, mtime=None):
+    """Get a copy of a blob store file with a different mode or mtime, creating it if missing.
+
+    :param str source: Blob store file.
+    :param str suffix: Appended to the file name with a dash to name the copy.
+    :param int mode: Set permissions of the copy.
+    :param int mtime: Set access and modification times of the copy.
+
+    :return: Path to the copy.
+    :rtype: str
+    """
+    variant = "{}-{}".format(source, suffix)
+    if not _store_existing(variant):
+        handle, temp_path = tempfile.mkstemp(".tmp", dir=os.path.dirname(source))
+        os.close(handle)
+        shutil.copyfile(source, temp_path)
+        os.chmod(temp_path, STORE_MODE if mode is None else mode)
+        if mtime is not None:
+            os.utime(temp_path, (mtime, mtime))
+        os.replace(temp_path, variant)
+    return variant
+
+
+def _link(source, destination):
+    """Hard link source to destination, copying instead when the file system does not allow it.
+
+    :param str source: Existing file.
+    :param str destination: New file path.
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+        shutil.copymode(source, destination)
+
+
+def export_linked(local_root, commit, target, blob_store, paths=None, copy_paths=None):
+    """Export git commit to directory by hard linking files from a content addressed blob store.
+
+    Blobs are keyed by their git id and only those not already in the store are read from git, so exporting a commit
+    similar to one exported before (even in an earlier run) writes almost nothing new. Executable files and RST files
+    (whose mtime is set to their last commit date like export() does) get their own store entries since hard links
+    share permissions and timestamps.
+
+    Unlike "git archive" this ignores export-ignore and export-subst attributes. Linked files are read-only. Files
+    below copy_paths (e.g. the Sphinx source directory, where extensions like autosummary write to existing files) are
+    copied from the store instead, so writing to them can't change the store even when permissions aren't enforced.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA to export.
+    :param str target: Directory to export to.
+    :param str blob_store: Directory holding one file per blob, created if missing.
+    :param iter paths: Only export these files/directories (relative to the git root). Missing ones are ignored.
+    :param iter copy_paths: Copy instead of link files below these directories (relative to the git root, "" for all).
+    """
+    log = logging.getLogger(__name__)
+    copy_prefixes = tuple(p.strip("/") + "/" for p in copy_paths or () if p.strip("/."))
+    copy_all = any(not p.strip("/.") for p in copy_paths or ())
+    if not os.path.isdir(blob_store):
+        os.makedirs(blob_store, exist_ok=True)
+
+    # List files.
+    entries = list()
+    command = ["git", "ls-tree", "-r", "-z", "--full-tree", commit]
+    if paths is not None:
+        command += ["--"] + list(paths)
+    output = run_command(local_root, command)
+    for line in output.split("\0"):
+        if not line:
+            continue
+        info, path = line.split("\t", 1)
+        mode, kind, blob = info.split()
+        if kind == "blob":  # Skip submodules.
+            entries.append((mode, blob, path))
+    _store_blobs(local_root, blob_store, {e[1] for e in entries})
+
+    # Materialize.
+    last_committed, copied = None, 0
+    for mode, blob, path in entries:
+        destination = os.path.join(target, path)
+        if not os.path.isdir(os.path.dirname(destination)):
+            os.makedirs(os.path.dirname(destination))
+        if os.path.lexists(destination):  # Replace instead of writing through links.
+            os.remove(destination)
+        source = os.path.join(blob_store, blob)
+        if mode == "120000":  # Symbolic link, blob contents are the link target.
+            with open(source, "rb") as handle:
+                link = handle.read().decode("utf-8", "surrogateescape")
+            os.symlink(link, destination)
+            continue
+        timestamp = None
+        if mode != "100755" and os.path.splitext(path)[1].lower() == ".rst":
+            if last_committed is None:
+                with TIMINGS.measure("mtimes", commit):
+                    last_committed = last_modified(local_root, commit)
+            if path not in last_committed:
+                last_committed[path] = int(
+                    run_command(
+                        local_root,
+                        ["git", "log", "-n1", "--format=%at", commit, "--", path],
+                    )
+                )
+            timestamp = last_committed[path]
+        if copy_all or path.startswith(copy_prefixes):
+            shutil.copyfile(source, destination)
+            os.chmod(destination, 0o755 if mode == "100755" else 0o644)
+            if timestamp is not None:
+                os.utime(destination, (timestamp, timestamp))
+            copied += 1
+            continue
+        if mode == "100755":
+            source = _store_variant(source, "x", mode=STORE_MODE_EXECUTABLE)
+        elif timestamp is not None:
+            source = _store_variant(source, str(timestamp), mtime=timestamp)
+        _link(source, destination)
+    log.debug(
+        "Linked %d and copied %d files from %s into %s.",
+        len(entries) - copied,
+        copied,
+        blob_store,
+        target,
+    )
+
+
+def existing_paths(local_root, commit, paths):
+    """Filter out paths (files or directories) that don't exist at a commit using a single git process.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA.
+    :param iter paths: Paths relative to the git root.
+
+    :return: Paths that exist, in the same order.
+    :rtype: list
+    """
+    paths = list(paths)
+    if not paths:
+        return paths
+    output = run_command(
+        local_root,
+        ["git", "cat-file", "--batch-check"],
+        stdin="".join("{}:{}\n".format(commit, p) for p in paths),
+    )
+    return [p for p, l in zip(paths, output.splitlines()) if RE_BATCH_CHECK.match(l)]
+
+
+def _extract_tar(stream, target):
+    """Extract a tar archive written by "git archive" to a directory.
+
+    Member paths are validated lexically instead of resolving each one on disk. That is enough for "git archive"
+    output: paths are relative, a path can't be both a directory and a symlink in one tree, and links are only created
+    after all regular files have been written. Directories are created once each, and file contents are written
+    directly instead of going through TarFile.extract().
+
+    :param file stream: Uncompressed tar archive (e.g. git's stdout pipe), read sequentially.
+    :param str target: Existing directory to extract to. Must be a real path (no symlinks).
+
+    :return: Paths (relative to target) of extracted RST files.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    debug = log.isEnabledFor(logging.DEBUG)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    made_dirs = {""}
+    queued_links = list()
+    rst_files = list()
+    try:
+        with tarfile.open(fileobj=stream, mode="r|") as tar:
+            for info in tar:
+                if debug:
                     log.debug(
                         "name: %s; mode: %d; size: %s; type: %s",
                         info.name,
@@ -329,41 +744,87 @@ def export(local_root, commit, target):
                         info.size,
                         info.type,
                     )
-                    path = os.path.realpath(os.path.join(target, info.name))
-                    if not path.startswith(target):  # Handle bad paths.
-                        log.warning(
-                            "Ignoring tar object path %s outside of target directory.",
-                            info.name,
+                name = posixpath.normpath(info.name)
+                if name.startswith(("/", "../")) or name == "..":  # Handle bad paths.
+                    log.warning(
+                        "Ignoring tar object path %s outside of target directory.",
+                        info.name,
+                    )
+                elif info.isdir():  # Handle directories.
+                    if name not in made_dirs:
+                        os.makedirs(
+                            os.path.join(target, name), mode=info.mode, exist_ok=True
                         )
-                    elif info.isdir():  # Handle directories.
-                        if not os.path.exists(path):
-                            os.makedirs(path, mode=info.mode)
-                    elif info.issym() or info.islnk():  # Queue links.
-                        queued_links.append(info)
-                    else:  # Handle files.
-                        tar.extract(member=info, path=target)
-                        if os.path.splitext(info.name)[1].lower() == ".rst":
-                            mtimes.append(info.name)
-                for info in queued_links:
-                    # There used to be a check for broken symlinks here, but it was buggy
-                    tar.extract(member=info, path=target)
-        except tarfile.TarError as exc:
-            log.debug(
-                'Failed to extract output from "git archive" command: %s', str(exc)
-            )
+                        made_dirs.add(name)
+                elif info.issym() or info.islnk():  # Queue links.
+                    queued_links.append(info)
+                elif info.isreg():  # Handle files.
+                    parent = posixpath.dirname(name)
+                    if parent not in made_dirs:
+                        os.makedirs(os.path.join(target, parent), exist_ok=True)
+                        made_dirs.add(parent)
+                    path = os.path.join(target, name)
+                    source = tar.extractfile(info)
+                    handle = os.open(path, flags, info.mode)
+                    if not IS_WINDOWS:
+                        os.fchmod(handle, info.mode)  # Ignore umask like TarFile.
+                    with open(handle, "wb") as destination:
+                        shutil.copyfileobj(source, destination)
+                    os.utime(path, (info.mtime, info.mtime))
+                    if posixpath.splitext(name)[1].lower() == ".rst":
+                        rst_files.append(name)
+            for info in queued_links:
+                # There used to be a check for broken symlinks here, but it was buggy
+                tar.extract(member=info, path=target)
+    except tarfile.TarError as exc:
+        log.debug('Failed to extract output from "git archive" command: %s', str(exc))
+    return rst_files
+
+
+def export(local_root, commit, target, paths=None):
+    """Export git commit to directory. "Extracts" all files at the commit to the target directory.
+
+    Set mtime of RST files to last commit date.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA to export.
+    :param str target: Directory to export to.
+    :param iter paths: Only export these files/directories (relative to the git root). Missing ones are ignored.
+    """
+    target = os.path.realpath(target)
+    mtimes = list()
+
+    def extract(stdout):
+        """Extract tar archive from "git archive" stdout.
+
+        :param file stdout: Handle to git's stdout pipe.
+        """
+        os.makedirs(target, exist_ok=True)
+        mtimes.extend(_extract_tar(stdout, target))
 
     # Run command.
-    run_command(local_root, ["git", "archive", "--format=tar", commit], pipeto=extract)
+    command = ["git", "archive", "--format=tar", commit]
+    if paths is not None:
+        command += ["--"] + existing_paths(local_root, commit, paths)
+    run_command(local_root, command, pipeto=extract)
 
     # Set mtime.
-    for file_path in mtimes:
-        last_committed = int(
-            run_command(
-                local_root,
-                ["git", "log", "-n1", "--format=%at", commit, "--", file_path],
-            )
-        )
-        os.utime(os.path.join(target, file_path), (last_committed, last_committed))
+    if not mtimes:
+        return
+    with TIMINGS.measure("mtimes", commit):
+        last_committed = last_modified(local_root, commit)
+        for file_path in mtimes:
+            if file_path not in last_committed:  # Merge simplification can hide it.
+                last_committed[file_path] = int(
+                    run_command(
+                        local_root,
+                        ["git", "log", "-n1", "--format=%at", commit, "--", file_path],
+                    )
+                )
+            timestamp = last_committed[file_path]
+            os.utime(os.path.join(target, file_path), (timestamp, timestamp))
 
 
 def clone(local_root, new_root, remote, branch, rel_dest, exclude):
@@ -1,15 +1,25 @@
 """Common objects used throughout the project."""
 
 import atexit
+import contextlib
 import functools
 import logging
+import multiprocessing
 import os
 import shutil
+import sys
 import tempfile
+import time
+import traceback
 import weakref
 
 import click
 
+try:
+    import resource
+except ImportError:  # Windows.
+    resource = None
+
 
 class Config(object):
     """The global configuration and state of the running program."""
@@ -22,6 +32,7 @@ class Config(object):
         # Booleans.
         self.banner_greatest_tag = False
         self.banner_recent_tag = False
+        self.changed_only = False
         self.greatest_tag = False
         self.invert = False
         self.no_colors = False
@@ -30,17 +41,24 @@ class Config(object):
         self.use_master_templates = False
         self.recent_tag = False
         self.show_banner = False
+        self.sparse_export = False
+        self.versions_json = False
 
         # Strings.
         self.banner_main_ref = "master"
+        self.cache_dir = None
         self.chdir = None
+        self.fetch_filter = None
         self.git_root = None
         self.local_conf = None
         self.priority = None
+        self.profile_dir = None
         self.push_remote = "origin"
         self.root_ref = "master"
+        self.timings = None
 
         # Tuples.
+        self.export_paths = tuple()
         self.grm_exclude = tuple()
         self.overflow = tuple()
         self.sort = tuple()
@@ -48,6 +66,9 @@ class Config(object):
         self.whitelist_tags = tuple()
 
         # Integers.
+        self.export_jobs = 1
+        self.jobs = 1
+        self.max_worker_jobs = 1
         self.verbose = 0
 
     def __contains__(self, item):
@@ -154,12 +175,13 @@ class HandledError(click.ClickException):
 class TempDir(object):
     """Similar to TemporaryDirectory in Python 3.x but with tuned weakref implementation."""
 
-    def __init__(self, defer_atexit=False):
+    def __init__(self, defer_atexit=False, parent=None):
         """Constructor.
 
         :param bool defer_atexit: cleanup() to atexit instead of after garbage collection.
+        :param str parent: Create the directory in here instead of the default temporary directory.
         """
-        self.name = tempfile.mkdtemp("sphinxcontrib_versioning")
+        self.name = tempfile.mkdtemp("sphinxcontrib_versioning", dir=parent)
         if defer_atexit:
             atexit.register(shutil.rmtree, self.name, True)
             return
@@ -185,3 +207,295 @@ class TempDir(object):
         )
         if os.path.exists(self.name):
             raise IOError(17, "File exists: '{}'".format(self.name))
+
+
+def _job_state():
+    """Snapshot process state that jobs may change. Used by _worker().
+
+    :return: sys.path, sys.modules names, os.environ, working directory, sys.stdout/stderr and copies of fds 1 and 2.
+    :rtype: tuple
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return (
+        list(sys.path),
+        set(sys.modules),
+        dict(os.environ),
+        os.getcwd(),
+        (sys.stdout, sys.stderr),
+        (os.dup(1), os.dup(2)),
+    )
+
+
+def _restore_job_state(state):
+    """Undo what a job changed in the worker process. Used by _worker().
+
+    Modules imported by the job are kept when they were loaded from directories already on sys.path before the job
+    (e.g. Sphinx extensions from site-packages) so later jobs don't import them again. Modules from anywhere else, such
+    as a project's own package added to sys.path by its conf.py, are removed so the next version imports its own copy.
+
+    :param tuple state: From _job_state().
+    """
+    path, modules, environ, cwd, streams, fds = state
+    os.chdir(cwd)
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (OSError, ValueError):
+            pass
+    os.dup2(fds[0], 1)
+    os.dup2(fds[1], 2)
+    os.close(fds[0])
+    os.close(fds[1])
+    sys.stdout, sys.stderr = streams
+
+    keep = tuple(os.path.join(os.path.abspath(p or cwd), "") for p in path)
+    for name in [n for n in sys.modules if n not in modules]:
+        file_path = getattr(sys.modules[name], "__file__", None)
+        if not file_path or not os.path.abspath(file_path).startswith(keep):
+            del sys.modules[name]
+    sys.path[:] = path
+    os.environ.clear()
+    os.environ.update(environ)
+
+
+def _worker(connection, max_jobs):
+    """Run jobs received from a WorkerPool until `max_jobs` are done or the pool closes the connection.
+
+    Each job is a (function, args) tuple. The function's return value is sent back along with an exit code like
+    multiprocessing.Process.exitcode would be if the function was run in its own process, the CPU seconds the job used
+    (including child processes it waited for) and this process's peak memory so far, since the parent process only
+    sees those in os.times() and getrusage() after the worker exits.
+
+    :param multiprocessing.connection.Connection connection: Communication channel to the parent process.
+    :param int max_jobs: Exit after this many jobs.
+    """
+    for _ in range(max_jobs):
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        func, args = job
+        state = _job_state()
+        start = os.times()
+        value, exitcode = None, 0
+        try:
+            value = func(*args)
+        except SystemExit as exc:
+            if exc.code is not None and not isinstance(exc.code, int):
+                sys.stderr.write("{}\n".format(exc.code))
+                exitcode = 1
+            else:
+                exitcode = exc.code or 0
+        except BaseException:  # Same as multiprocessing.Process.
+            traceback.print_exc()
+            exitcode = 1
+        finally:
+            _restore_job_state(state)
+        end = os.times()
+        peak_rss = None
+        if resource is not None:
+            peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        connection.send((exitcode, value, sum(end[:4]) - sum(start[:4]), peak_rss))
+
+
+class PoolJob(object):
+    """A job submitted to a WorkerPool. Has the same interface as multiprocessing.Process for waiting on it.
+
+    :ivar int exitcode: Set by join(). 0 on success, like multiprocessing.Process.exitcode otherwise.
+    :ivar sentinel: Becomes ready (see multiprocessing.connection.wait()) when the job is done.
+    :ivar value: Return value of the job's function, set by join().
+    """
+
+    def __init__(self, pool, worker):
+        """Constructor.
+
+        :param WorkerPool pool: Pool that runs the job.
+        :param tuple worker: Process and connection of the worker running the job.
+        """
+        self._pool = pool
+        self._worker = worker
+        self.exitcode = None
+        self.sentinel = worker[1]
+        self.value = None
+
+    def join(self):
+        """Wait for the job to finish and hand its worker back to the pool."""
+        if self.exitcode is not None:
+            return
+        process, connection = self._worker
+        cpu, peak_rss = 0.0, None
+        try:
+            self.exitcode, self.value, cpu, peak_rss = connection.recv()
+        except EOFError:  # Worker died.
+            process.join()
+            self.exitcode = process.exitcode or 1
+        self._pool.release(self._worker, cpu, peak_rss)
+
+    def terminate(self):
+        """Kill the worker running this job."""
+        self._worker[0].terminate()
+
+
+class WorkerPool(object):
+    """Processes that run several jobs each instead of forking once per job, recycled after `max_jobs` jobs.
+
+    Workers are forked when needed (as many as jobs running at the same time) and only import modules once. State jobs
+    change (sys.path, sys.modules, os.environ, the working directory and stdout/stderr) is restored between jobs.
+
+    :cvar float cpu: CPU seconds of finished jobs of all pools whose workers haven't been reaped yet. Added by usage().
+    :cvar int peak_rss: Most memory any worker used so far in KiB, None if unknown. Used by usage().
+    """
+
+    cpu = 0.0
+    peak_rss = None
+
+    def __init__(self, max_jobs):
+        """Constructor.
+
+        :param int max_jobs: Number of jobs after which a worker exits and is replaced.
+        """
+        self.max_jobs = max_jobs
+        self._cpu = dict()
+        self._done = dict()
+        self._idle = list()
+        atexit.register(self.close)
+
+    def submit(self, func, args):
+        """Run a function in an idle worker (forking a new one if there is none).
+
+        :param function func: Module level function to run.
+        :param tuple args: Positional arguments for func, must be picklable.
+
+        :return: Handle to wait on.
+        :rtype: PoolJob
+        """
+        if self._idle:
+            worker = self._idle.pop()
+        else:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker, args=(child, self.max_jobs)
+            )
+            process.start()
+            child.close()  # So recv() raises EOFError if the worker dies.
+            worker = (process, parent)
+            self._cpu[worker] = 0.0
+            self._done[worker] = 0
+        worker[1].send((func, args))
+        self._done[worker] += 1
+        return PoolJob(self, worker)
+
+    def release(self, worker, cpu=0.0, peak_rss=None):
+        """Make a worker available again after its job is done, or reap it if it exited.
+
+        :param tuple worker: Process and connection of the worker.
+        :param float cpu: CPU seconds used by the job.
+        :param int peak_rss: Peak memory of the worker in KiB.
+        """
+        WorkerPool.cpu += cpu
+        self._cpu[worker] += cpu
+        if peak_rss is not None:
+            WorkerPool.peak_rss = max(peak_rss, WorkerPool.peak_rss or 0)
+        if self._done[worker] < self.max_jobs and worker[0].is_alive():
+            self._idle.append(worker)
+            return
+        self._reap(worker)
+
+    def _reap(self, worker):
+        """Wait for a worker that exited or was told to. Its CPU time is in os.times() now, stop adding its jobs'.
+
+        :param tuple worker: Process and connection of the worker.
+        """
+        worker[0].join()
+        worker[1].close()
+        WorkerPool.cpu -= self._cpu.pop(worker)
+        self._done.pop(worker)
+
+    def close(self):
+        """Stop idle workers."""
+        while self._idle:
+            worker = self._idle.pop()
+            worker[1].send(None)
+            self._reap(worker)
+
+
+def usage():
+    """Measure wall clock, CPU time and peak memory of this process and its finished child processes so far.
+
+    Jobs finished by WorkerPool workers count as finished child processes even while the worker is still running.
+
+    :return: Wall clock seconds (arbitrary start), CPU seconds, peak resident set size in KiB (None on Windows).
+    :rtype: tuple
+    """
+    times = os.times()
+    cpu = times.user + times.system + times.children_user + times.children_system
+    cpu += WorkerPool.cpu
+    peak_rss = None
+    if resource is not None:
+        peak_rss = max(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+            WorkerPool.peak_rss or 0,
+        )
+        if sys.platform == "darwin":  # Bytes instead of KiB.
+            peak_rss //= 1024
+    return time.perf_counter(), cpu, peak_rss
+
+
+class Timings(object):
+    """Wall time, CPU time and peak memory of build phases and of every ref's steps, reported with --timings.
+
+    CPU time includes child processes (git, sphinx-build) once they have been waited for, and jobs of reused
+    --max-worker-jobs workers once they're done. Peak memory is the most this process or any finished child or worker
+    used so far. Both are exact for steps that run one at a time, steps running at
+    the same time (--jobs, --export-jobs) share them.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self.records = list()
+        self.start = usage()
+
+    def reset(self):
+        """Forget all records and restart the total."""
+        self.records = list()
+        self.start = usage()
+
+    def record(self, step, ref, start, end=None):
+        """Add a measurement.
+
+        :param str step: Phase or step name.
+        :param str ref: Name or commit SHA the step was for. None for phases.
+        :param tuple start: usage() before the step.
+        :param tuple end: usage() after the step. Defaults to now.
+        """
+        end = usage() if end is None else end
+        self.records.append(
+            dict(
+                cpu=round(end[1] - start[1], 3),
+                peak_rss=end[2],
+                ref=ref,
+                started=round(start[0] - self.start[0], 3),
+                step=step,
+                wall=round(end[0] - start[0], 3),
+            )
+        )
+
+    @contextlib.contextmanager
+    def measure(self, step, ref=None):
+        """Context manager that records the code it wraps, even if it raises.
+
+        :param str step: Phase or step name.
+        :param str ref: Name or commit SHA the step is for. None for phases.
+        """
+        start = usage()
+        try:
+            yield
+        finally:
+            self.record(step, ref, start)
+
+
+TIMINGS = Timings()
@@ -1,23 +1,261 @@
 """Functions that perform main tasks. Code is here instead of in __main__.py."""
 
+import concurrent.futures
+import hashlib
+import itertools
 import json
 import logging
+import multiprocessing.connection
 import os
+import posixpath
 import re
+import shutil
 import subprocess
 import sys
+import tempfile
 
+import sphinx
+
+from sphinxcontrib_versioning import __version__
 from sphinxcontrib_versioning.git import (
     export,
+    export_linked,
     fetch_commits,
+    fetch_missing,
     filter_and_date,
     GitError,
     list_remote,
 )
-from sphinxcontrib_versioning.lib import Config, HandledError, TempDir
-from sphinxcontrib_versioning.sphinx_ import build, read_config
+from sphinxcontrib_versioning.lib import Config, HandledError, TempDir, TIMINGS, usage
+from sphinxcontrib_versioning.sphinx_ import (
+    build,
+    read_config,
+    spawn_build,
+    store_versions,
+    write_versions_json,
+)
 
+CACHE_IGNORED_SETTINGS = (
+    "cache_dir",
+    "changed_only",
+    "chdir",
+    "export_jobs",
+    "fetch_filter",
+    "git_root",
+    "jobs",
+    "local_conf",
+    "max_worker_jobs",
+    "no_colors",
+    "no_local_conf",
+    "profile_dir",
+    "timings",
+    "verbose",
+)
 RE_INVALID_FILENAME = re.compile(r"[^0-9A-Za-z.-]")
+STATE_FILE = ".scv_state.json"
+STATE_IGNORED_SETTINGS = CACHE_IGNORED_SETTINGS + ("banner_main_ref", "root_ref")
+TIMINGS_STEPS = ("export", "mtimes", "probe_root", "probe", "build_root", "build")
+
+
+def _environ(remote):
+    """Environment variables exposed to a version's conf.py while sphinx-build runs.
+
+    :param dict remote: Remote from Versions.remotes.
+
+    :return: Environment variables.
+    :rtype: dict
+    """
+    if remote["name"] == "master":
+        return dict(code_version=f"master ({remote['sha8']})")
+    return dict(code_version=remote["name"])
+
+
+def _source(exported_root, remote):
+    """Path to the Sphinx source directory (containing conf.py) of an exported remote.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param dict remote: Remote from Versions.remotes.
+
+    :return: Source directory to pass to sphinx-build.
+    :rtype: str
+    """
+    return os.path.dirname(
+        os.path.join(exported_root, remote["sha"], remote["conf_rel_path"])
+    )
+
+
+def _doctree_dir(exported_root, remote, is_root):
+    """Path to the environment and doctrees of a remote, kept for the whole run.
+
+    Shared by read_config() and the final build so documents are only read once, and by builds repeated after a ref
+    fails so those only run the write phase. Root builds get their own since they may run at the same time as the
+    same remote's own build.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param dict remote: Remote from Versions.remotes.
+    :param bool is_root: Is this build in the web root?
+
+    :return: Directory to pass to sphinx-build's -d option.
+    :rtype: str
+    """
+    return os.path.join(
+        exported_root, ".doctrees_root" if is_root else ".doctrees", remote["root_dir"]
+    )
+
+
+def _menu_entries(remotes):
+    """What the versions list in every page is rendered from: name, kind, directory, master_doc and documents.
+
+    :param iter remotes: Remotes from Versions.remotes, in display order.
+
+    :return: One JSON serializable list per remote.
+    :rtype: list
+    """
+    return [
+        [r[k] for k in ("name", "kind", "root_dir", "master_doc")] + sorted(r["found_docs"])
+        for r in remotes
+    ]
+
+
+def _cache_key(source, remote, versions, is_root):
+    """Hash everything that affects the files sphinx-build writes for one version.
+
+    That is the commit and conf.py path, the conf.py file and _templates directory actually used (which may have been
+    replaced with master's), SCVersioning's settings, the versions of this extension and Sphinx, and what the list of
+    all versions is rendered from (since every page links to all of them, unless they're read from versions.json in
+    the browser). Commits and dates of other versions aren't included, so new commits on one branch don't invalidate
+    the cached builds of all others.
+
+    :param str source: Source directory passed to sphinx-build.
+    :param dict remote: Remote from Versions.remotes being built.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param bool is_root: Is this build in the web root?
+
+    :return: Hex digest.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    paths = [os.path.join(source, "conf.py")]
+    for root, dirs, files in os.walk(os.path.join(source, "_templates")):
+        dirs.sort()
+        paths.extend(os.path.join(root, f) for f in sorted(files))
+    for path in paths:
+        digest.update(os.path.relpath(path, source).encode("utf-8"))
+        with open(path, "rb") as handle:
+            digest.update(handle.read())
+
+    config = Config.from_context()
+    settings = [i for i in config if i[0] not in CACHE_IGNORED_SETTINGS]
+    if config.versions_json:
+        remotes = [r for r in versions.remotes if r["name"] == remote["name"]]
+    else:
+        remotes = versions.remotes
+    digest.update(
+        json.dumps(
+            dict(
+                current=[remote["sha"], remote["name"], remote["conf_rel_path"], is_root],
+                settings=settings,
+                software=[__version__, sphinx.__version__],
+                versions=_menu_entries(remotes),
+            ),
+            default=repr,
+            sort_keys=True,
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def _cache_restore(key, target):
+    """Copy a previously cached sphinx-build output directory to target.
+
+    :param str key: Output of _cache_key().
+    :param str target: Destination directory to copy/overwrite built docs to.
+
+    :return: If the cache had an entry for key.
+    :rtype: bool
+    """
+    log = logging.getLogger(__name__)
+    cached = os.path.join(Config.from_context().cache_dir, "builds", key)
+    if not os.path.isdir(cached):
+        return False
+    log.debug("Copying cached build %s to %s", cached, target)
+    shutil.copytree(cached, target, dirs_exist_ok=True)
+    return True
+
+
+def _cache_staging():
+    """Create an empty directory in the cache for sphinx-build to write to before it is stored by _cache_store().
+
+    :return: Directory path.
+    :rtype: str
+    """
+    builds = os.path.join(Config.from_context().cache_dir, "builds")
+    if not os.path.isdir(builds):
+        os.makedirs(builds)
+    return tempfile.mkdtemp(".tmp", dir=builds)
+
+
+def _cache_store(key, staging, target):
+    """Move a successful sphinx-build output directory into the cache and copy it to target.
+
+    :param str key: Output of _cache_key().
+    :param str staging: Output of _cache_staging() that sphinx-build wrote to.
+    :param str target: Destination directory to copy/overwrite built docs to.
+    """
+    cached = os.path.join(Config.from_context().cache_dir, "builds", key)
+    try:
+        os.rename(staging, cached)
+    except OSError:  # Stored by another process in the meantime.
+        shutil.rmtree(staging)
+    _cache_restore(key, target)
+
+
+def _build_cached(exported_root, remote, target, versions, is_root, stored=None):
+    """Build one version, or copy its output from the build cache if enabled and nothing relevant has changed.
+
+    :raise HandledError: If sphinx-build fails. Will be logged before raising.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param dict remote: Remote from Versions.remotes to build.
+    :param str target: Destination directory to write documentation to.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param bool is_root: Is this build in the web root?
+    :param str stored: Path to `versions` written by store_versions(), if already stored.
+    """
+    log = logging.getLogger(__name__)
+    source = _source(exported_root, remote)
+    doctree_dir = _doctree_dir(exported_root, remote, is_root)
+    if not Config.from_context().cache_dir:
+        build(
+            source,
+            target,
+            stored or versions,
+            remote["name"],
+            is_root,
+            _environ(remote),
+            doctree_dir,
+        )
+        return
+
+    key = _cache_key(source, remote, versions, is_root)
+    if _cache_restore(key, target):
+        log.info("Nothing changed, using cached build of: %s", remote["name"])
+        return
+    staging = _cache_staging()
+    try:
+        build(
+            source,
+            staging,
+            stored or versions,
+            remote["name"],
+            is_root,
+            _environ(remote),
+            doctree_dir,
+        )
+    except HandledError:
+        shutil.rmtree(staging)
+        raise
+    _cache_store(key, staging, target)
 
 
 def read_local_conf(local_conf):
@@ -77,7 +315,7 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
             dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
         except GitError:
             log.info("Need to fetch from remote...")
-            fetch_commits(root, remotes)
+            fetch_commits(root, remotes, Config.from_context().fetch_filter)
             try:
                 dates_paths = filter_and_date(
                     root, conf_rel_paths, (i[0] for i in remotes)
@@ -124,29 +362,148 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
     return whitelisted_remotes
 
 
-def pre_build(local_root, versions, use_master_conf=False, use_master_templates=False):
-    """Build docs for all versions to determine root directory and master_doc names.
+def _export_paths(versions):
+    """Get the paths to export for each commit. None means the whole repository.
 
-    Need to build docs to (a) avoid filename collision with files from root_ref and branch/tag names and (b) determine
-    master_doc config values for all versions (in case master_doc changes from e.g. contents.rst to index.rst between
-    versions).
+    With --sparse-export only the directory containing conf.py and any --export-path paths are exported. Falls back to
+    exporting everything when conf.py is in the git root or an export path is the git root.
+
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+
+    :return: Paths relative to the git root keyed by commit SHA.
+    :rtype: dict
+    """
+    config = Config.from_context()
+    paths = dict()
+    for remote in versions.remotes:
+        if remote["sha"] in paths:
+            continue
+        conf_dir = posixpath.dirname(remote["conf_rel_path"])
+        if not config.sparse_export or not conf_dir:
+            paths[remote["sha"]] = None
+            continue
+        extra = [p.replace(os.sep, "/").strip("/") for p in config.export_paths]
+        if any(p in ("", ".") for p in extra):
+            paths[remote["sha"]] = None
+            continue
+        paths[remote["sha"]] = [conf_dir] + extra
+    return paths
 
-    Exports all commits into a temporary directory and returns the path to avoid re-exporting during the final build.
+
+def _export_one(local_root, exported_root, sha, paths, cache_dir, source_dir=""):
+    """Export one commit into a subdirectory of the temporary directory.
 
     :param str local_root: Local path to git root directory.
-    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param str sha: Git commit SHA to export.
+    :param iter paths: Only export these paths. None exports everything.
+    :param str cache_dir: Link files from the blob store in this cache directory instead of extracting them. Optional.
+    :param str source_dir: Directory with conf.py relative to the git root. Files in it are copied, not linked.
+    """
+    log = logging.getLogger(__name__)
+    target = os.path.join(exported_root, sha)
+    with TIMINGS.measure("export", sha):
+        if cache_dir:
+            log.debug("Linking %s from blob store to temporary directory.", sha)
+            export_linked(
+                local_root,
+                sha,
+                target,
+                os.path.join(cache_dir, "blobs"),
+                paths,
+                [source_dir],
+            )
+        else:
+            log.debug("Exporting %s to temporary directory.", sha)
+            export(local_root, sha, target, paths)
 
-    :return: Tempdir path with exported commits as subdirectories.
-    :rtype: str
+
+def _export_all(local_root, exported_root, export_paths, cache_dir, source_dirs=None):
+    """Export all commits, up to --export-jobs of them at the same time in threads.
+
+    Each export mostly waits on git and the file system so threads are enough to keep several going at once. Exports
+    write to different directories and the blob store is only ever updated by renaming complete files into place.
+
+    :raise CalledProcessError: Unhandled git command failure (first one raised by any export).
+
+    :param str local_root: Local path to git root directory.
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param dict export_paths: Paths to export keyed by commit SHA, from _export_paths().
+    :param str cache_dir: Link files from the blob store in this cache directory instead of extracting them. Optional.
+    :param dict source_dirs: Directory with conf.py keyed by commit SHA, see _export_one(). Default: the git root.
     """
     log = logging.getLogger(__name__)
-    exported_root = TempDir(True).name
+    source_dirs = source_dirs or dict()
+
+    # Fetch files missing from a partial clone with one "git fetch" per set of paths instead of one per file.
+    by_paths = dict()
+    for sha, paths in export_paths.items():
+        by_paths.setdefault(None if paths is None else tuple(paths), list()).append(sha)
+    for paths, shas in by_paths.items():
+        fetch_missing(local_root, shas, paths)
+
+    jobs = min(Config.from_context().export_jobs, len(export_paths))
+    if jobs <= 1:
+        for sha, paths in export_paths.items():
+            _export_one(
+                local_root,
+                exported_root,
+                sha,
+                paths,
+                cache_dir,
+                source_dirs.get(sha, ""),
+            )
+        return
+
+    log.info("Exporting %d commits with %d threads.", len(export_paths), jobs)
+    with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
+        futures = [
+            executor.submit(
+                _export_one,
+                local_root,
+                exported_root,
+                sha,
+                paths,
+                cache_dir,
+                source_dirs.get(sha, ""),
+            )
+            for sha, paths in export_paths.items()
+        ]
+        try:
+            completed = concurrent.futures.as_completed(futures)
+            for done, future in enumerate(completed, 1):
+                future.result()
+                log.info("Exported %d/%d commits.", done, len(futures))
+        except BaseException:
+            for future in futures:  # Don't start exports that haven't yet.
+                future.cancel()
+            raise
+
+
+def _export_remotes(
+    local_root, exported_root, versions, remotes, use_master_conf, use_master_templates
+):
+    """Export the commits of some versions that aren't exported yet and replace their conf.py/_templates if requested.
+
+    :param str local_root: Local path to git root directory.
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param iter remotes: Remotes from Versions.remotes to export.
+    :param bool use_master_conf: Replace conf.py with master's.
+    :param bool use_master_templates: Replace the _templates directory with master's.
+    """
+    cache_dir = Config.from_context().cache_dir
+    shas = {
+        r["sha"]
+        for r in remotes
+        if not os.path.isdir(os.path.join(exported_root, r["sha"]))
+    }
+    remotes = [r for r in remotes if r["sha"] in shas]
 
     # Extract all.
-    for sha in {r["sha"] for r in versions.remotes}:
-        target = os.path.join(exported_root, sha)
-        log.debug("Exporting %s to temporary directory.", sha)
-        export(local_root, sha, target)
+    export_paths = {k: v for k, v in _export_paths(versions).items() if k in shas}
+    source_dirs = {r["sha"]: posixpath.dirname(r["conf_rel_path"]) for r in remotes}
+    _export_all(local_root, exported_root, export_paths, cache_dir, source_dirs)
 
     # Copy conf.py from local master to all branches and tags
     if use_master_conf:
@@ -154,12 +511,14 @@ def pre_build(local_root, versions, use_master_conf=False, use_master_templates=
         assert len(master_remote) == 1
         master_remote = master_remote[0]
         master_conf_file = master_remote["conf_rel_path"]
-        for remote in list(versions.remotes):
+        for remote in remotes:
             import shutil
 
             filename = os.path.join(
                 exported_root, remote["sha"], remote["conf_rel_path"]
             )
+            if os.path.exists(filename):  # May be hard linked to the blob store.
+                os.remove(filename)
             shutil.copy(master_conf_file, filename)
 
     if use_master_templates:
@@ -169,7 +528,7 @@ def pre_build(local_root, versions, use_master_conf=False, use_master_templates=
         rel_path = os.path.dirname(master_remote["conf_rel_path"])
         master_templates = os.path.join(rel_path, "_templates")
         if os.path.exists(master_templates) and os.path.isdir(master_templates):
-            for remote in list(versions.remotes):
+            for remote in remotes:
                 import shutil
 
                 dst_path = os.path.join(
@@ -179,24 +538,105 @@ def pre_build(local_root, versions, use_master_conf=False, use_master_templates=
                     shutil.rmtree(dst_path)
                 shutil.copytree(master_templates, dst_path)
 
-    # Build root.
-    remote = versions[Config.from_context().root_ref]
-    with TempDir() as temp_dir:
+
+def _read_remotes(exported_root, versions, remotes):
+    """Get found_docs and master_doc values of some versions. Versions that fail are removed from `versions`.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param iter remotes: Remotes from Versions.remotes to read.
+    """
+    log = logging.getLogger(__name__)
+    for remote in remotes:
         log.debug(
-            "Building root (before setting root_dirs) in temporary directory: %s",
-            temp_dir,
+            "Partially running sphinx-build to read configuration for: %s",
+            remote["name"],
         )
-        source = os.path.dirname(
-            os.path.join(exported_root, remote["sha"], remote["conf_rel_path"])
+        try:
+            with TIMINGS.measure("probe", remote["name"]):
+                config = read_config(
+                    _source(exported_root, remote),
+                    remote["name"],
+                    _doctree_dir(exported_root, remote, False),
+                )
+        except HandledError:
+            log.warning("Skipping. Will not be building: %s", remote["name"])
+            versions.remotes.pop(versions.remotes.index(remote))
+            continue
+        remote["found_docs"] = config["found_docs"]
+        remote["master_doc"] = config["master_doc"]
+
+
+def pre_build(
+    local_root,
+    versions,
+    use_master_conf=False,
+    use_master_templates=False,
+    unchanged=None,
+):
+    """Build docs for all versions to determine root directory and master_doc names.
+
+    Need to build docs to (a) avoid filename collision with files from root_ref and branch/tag names and (b) determine
+    master_doc config values for all versions (in case master_doc changes from e.g. contents.rst to index.rst between
+    versions).
+
+    Exports all commits into a temporary directory and returns the path to avoid re-exporting during the final build.
+    Versions in `unchanged` are neither exported nor read, their values are taken from the previous build instead.
+    Those whose versions list would now be different are removed from `unchanged` and exported after all. They are
+    not read again, the values from the previous build are still right for their commit.
+
+    :param str local_root: Local path to git root directory.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param bool use_master_conf: Replace every version's conf.py with master's.
+    :param bool use_master_templates: Replace every version's _templates directory with master's.
+    :param dict unchanged: Output of read_state(). Its "listing" is set to the files in the root build.
+
+    :return: Tempdir path with exported commits as subdirectories.
+    :rtype: str
+    """
+    log = logging.getLogger(__name__)
+    if unchanged is None:
+        unchanged = dict(listing=None, refs=dict(), root=None, shas=dict())
+    root_remote = versions[Config.from_context().root_ref]
+    cache_dir = Config.from_context().cache_dir
+    if cache_dir:  # Same file system as the blob store so files can be hard linked.
+        os.makedirs(os.path.join(cache_dir, "exports"), exist_ok=True)
+        exported_root = TempDir(True, os.path.join(cache_dir, "exports")).name
+    else:
+        exported_root = TempDir(True).name
+
+    # Extract all.
+    changed = [r for r in versions.remotes if r["name"] not in unchanged["refs"]]
+    with TIMINGS.measure("export"):
+        _export_remotes(
+            local_root,
+            exported_root,
+            versions,
+            changed + ([] if unchanged["root"] else [root_remote]),
+            use_master_conf,
+            use_master_templates,
         )
-        code_version = f"master ({remote['sha8']})" if remote["name"] == "master" else remote["name"]
-        os.environ["code_version"] = code_version
-        build(source, temp_dir, versions, remote["name"], True)
-        os.environ.pop("code_version")
-        existing = os.listdir(temp_dir)
+
+    # Build root.
+    if unchanged["root"]:
+        existing = list(unchanged["root"]["listing"])
+    else:
+        with TempDir() as temp_dir, TIMINGS.measure("probe_root"):
+            log.debug(
+                "Building root (before setting root_dirs) in temporary directory: %s",
+                temp_dir,
+            )
+            with TIMINGS.measure("probe_root", root_remote["name"]):
+                _build_cached(exported_root, root_remote, temp_dir, versions, True)
+            existing = os.listdir(temp_dir)
+    unchanged["listing"] = list(existing)
 
     # Define root_dir for all versions to avoid file name collisions.
     for remote in versions.remotes:
+        if remote["name"] in unchanged["refs"]:
+            remote["root_dir"] = unchanged["refs"][remote["name"]]["root_dir"]
+            existing.append(remote["root_dir"])
+    for remote in changed:
         root_dir = RE_INVALID_FILENAME.sub("_", remote["name"])
         while root_dir in existing:
             root_dir += "_"
@@ -205,65 +645,480 @@ def pre_build(local_root, versions, use_master_conf=False, use_master_templates=
         existing.append(root_dir)
 
     # Get found_docs and master_doc values for all versions.
-    for remote in list(versions.remotes):
-        log.debug(
-            "Partially running sphinx-build to read configuration for: %s",
-            remote["name"],
+    with TIMINGS.measure("probe"):
+        _read_remotes(exported_root, versions, changed)
+    for remote in versions.remotes:
+        if remote["name"] in unchanged["refs"]:
+            entry = unchanged["refs"][remote["name"]]
+            remote["found_docs"] = tuple(entry["found_docs"])
+            remote["master_doc"] = entry["master_doc"]
+
+    # Unchanged versions must be built again if the versions list in their pages changed.
+    menu = _state_menu(versions)
+    stale = [
+        r
+        for r in versions.remotes
+        if r["name"] in unchanged["refs"]
+        and unchanged["refs"][r["name"]]["menu"] != menu
+    ]
+    stale_root = unchanged["root"] and unchanged["root"]["menu"] != menu
+    if stale or stale_root:
+        log.info(
+            "Versions list changed, also building: %s",
+            " ".join([r["name"] for r in stale] + ["(root)"] * bool(stale_root)),
         )
-        source = os.path.dirname(
-            os.path.join(exported_root, remote["sha"], remote["conf_rel_path"])
+        for remote in stale:
+            unchanged["refs"].pop(remote["name"])
+        if stale_root:
+            unchanged["root"] = None
+        with TIMINGS.measure("export"):
+            _export_remotes(
+                local_root,
+                exported_root,
+                versions,
+                stale + [root_remote] * bool(stale_root),
+                use_master_conf,
+                use_master_templates,
+            )
+    versions.pack_found_docs()
+
+    return exported_root
+
+
+def _build_serial(exported_root, versions, queue):
+    """Build root and refs one at a time. Refs that fail are removed from `versions` and skipped.
+
+    :raise HandledError: If the root build fails. Will be logged before raising.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param list queue: Tuples of (remote, target directory, is root build) to build in order.
+
+    :return: Items of `queue` built before a ref failed, their HTML still links to it.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    built, stale = list(), list()
+    stored = store_versions(versions)
+    for item in queue:
+        remote, target, is_root = item
+        log.info(
+            "Building root: %s" if is_root else "Building ref: %s", remote["name"]
         )
         try:
-            config = read_config(source, remote["name"])
+            with TIMINGS.measure("build_root" if is_root else "build", remote["name"]):
+                _build_cached(exported_root, remote, target, versions, is_root, stored)
         except HandledError:
-            log.warning("Skipping. Will not be building: %s", remote["name"])
+            if is_root:
+                raise
+            log.warning("Skipping. Will not be building %s.", remote["name"])
             versions.remotes.pop(versions.remotes.index(remote))
+            stored = store_versions(versions)
+            stale.extend(built)
+            built = list()
             continue
-        remote["found_docs"] = config["found_docs"]
-        remote["master_doc"] = config["master_doc"]
+        built.append(item)
+    return stale
 
-    return exported_root
 
+def _build_parallel(exported_root, versions, queue, jobs):
+    """Build root and refs with up to `jobs` sphinx-build child processes running at the same time.
+
+    Output of each sphinx-build is written to a log file and printed in the same order as a serial build would have, as
+    soon as that build and all the ones before it are done. Refs that fail are removed from `versions` as soon as they
+    exit so builds started afterwards don't link to them.
+
+    :raise HandledError: If the root build fails. Will be logged before raising.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param list queue: Tuples of (remote, target directory, is root build) to build.
+    :param int jobs: Maximum number of concurrent sphinx-build processes.
+
+    :return: Items of `queue` started before a ref failed, their HTML still links to it.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    cache_dir = Config.from_context().cache_dir
+    exitcodes = [None] * len(queue)
+    keys = [None] * len(queue)
+    stagings = [None] * len(queue)
+    generations = [None] * len(queue)  # Number of failed refs when started.
+    started = [None] * len(queue)  # usage() when started.
+    generation = 0
+    flushed = 0
+    running = dict()
+    stored = store_versions(versions)  # Again whenever a ref fails.
+
+    with TempDir() as log_dir:
+        pending = iter(enumerate(queue))
+        while flushed < len(queue):
+            # Fill the pool. Cache hits don't take a slot, keep starting builds until all slots are busy.
+            while len(running) < jobs:
+                index, item = next(pending, (None, None))
+                if item is None:
+                    break
+                remote, target, is_root = item
+                source = _source(exported_root, remote)
+                log_path = os.path.join(log_dir, "{}.log".format(index))
+                generations[index] = generation
+                started[index] = usage()
+                step = "build_root" if is_root else "build"
+                if cache_dir:
+                    keys[index] = _cache_key(source, remote, versions, is_root)
+                    if _cache_restore(keys[index], target):
+                        with open(log_path, "w") as handle:
+                            handle.write("Nothing changed, using cached build.\n")
+                        exitcodes[index] = 0
+                        TIMINGS.record(step, remote["name"], started[index])
+                        continue
+                    stagings[index] = target = _cache_staging()
+                child = spawn_build(
+                    source,
+                    target,
+                    stored,
+                    remote["name"],
+                    is_root,
+                    _environ(remote),
+                    log_path,
+                    _doctree_dir(exported_root, remote, is_root),
+                )
+                running[child.sentinel] = index, child
 
-def build_all(exported_root, destination, versions):
+            # Wait for at least one child.
+            ready = multiprocessing.connection.wait(list(running)) if running else ()
+            for sentinel in ready:
+                index, child = running.pop(sentinel)
+                before = usage()
+                child.join()
+                exitcodes[index] = child.exitcode
+                remote, _, is_root = queue[index]
+                TIMINGS.record(  # CPU time of this child only, it's reaped by join().
+                    "build_root" if is_root else "build",
+                    remote["name"],
+                    (started[index][0], before[1], None),
+                )
+                if child.exitcode != 0 and not is_root:
+                    versions.remotes.pop(versions.remotes.index(remote))
+                    stored = store_versions(versions)
+                    generation += 1
+
+            # Print output in order.
+            while flushed < len(queue) and exitcodes[flushed] is not None:
+                remote, target, is_root = queue[flushed]
+                log.info(
+                    "Building root: %s" if is_root else "Building ref: %s",
+                    remote["name"],
+                )
+                with open(os.path.join(log_dir, "{}.log".format(flushed))) as handle:
+                    sys.stdout.write(handle.read())
+                sys.stdout.flush()
+                if exitcodes[flushed] == 0 and stagings[flushed]:
+                    _cache_store(keys[flushed], stagings[flushed], target)
+                elif exitcodes[flushed] != 0:
+                    log.error("sphinx-build failed for branch/tag: %s", remote["name"])
+                    if stagings[flushed]:
+                        shutil.rmtree(stagings[flushed])
+                    if is_root:
+                        for _, child in running.values():
+                            child.terminate()
+                            child.join()
+                        raise HandledError
+                    log.warning("Skipping. Will not be building %s.", remote["name"])
+                flushed += 1
+
+    return [
+        item
+        for item, code, started_in in zip(queue, exitcodes, generations)
+        if code == 0 and started_in < generation
+    ]
+
+
+def build_all(exported_root, destination, versions, unchanged=None):
     """Build all versions.
 
+    Refs that fail to build are skipped. Versions already built by then are built again so they stop linking to the
+    failed ref, which only runs Sphinx's write phase since each version keeps its doctrees in `exported_root`. With
+    --versions-json pages don't link to other versions, versions.json is written after all builds instead.
+
     :param str exported_root: Tempdir path with exported commits as subdirectories.
     :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
     :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param dict unchanged: Output of read_state(). Skip building these versions, they are still in `destination`.
     """
     log = logging.getLogger(__name__)
+    config = Config.from_context()
+    jobs = config.jobs
+    root_remote = versions[config.root_ref]
+    queue = [(root_remote, destination, True)] + [
+        (r, os.path.join(destination, r["root_dir"]), False) for r in versions.remotes
+    ]
+    if unchanged and (unchanged["root"] or unchanged["refs"]):
+        skipped = sorted(unchanged["refs"]) + (["(root)"] if unchanged["root"] else [])
+        log.info("Up to date, not building: %s", " ".join(skipped))
+        queue = [
+            i
+            for i in queue
+            if not (unchanged["root"] if i[2] else i[0]["name"] in unchanged["refs"])
+        ]
 
-    while True:
-        # Build root.
-        remote = versions[Config.from_context().root_ref]
-        log.info("Building root: %s", remote["name"])
-        source = os.path.dirname(
-            os.path.join(exported_root, remote["sha"], remote["conf_rel_path"])
+    while queue:
+        if jobs > 1:
+            queue = _build_parallel(exported_root, versions, queue, jobs)
+        else:
+            queue = _build_serial(exported_root, versions, queue)
+        if queue and config.versions_json:
+            queue = list()
+        elif queue:
+            log.info(
+                "Refreshing version lists of: %s", " ".join(i[0]["name"] for i in queue)
+            )
+
+    if config.versions_json:
+        write_versions_json(destination, versions)
+
+
+def _state_config(versions):
+    """Hash everything besides the commit that affects the output of all versions, for --changed-only.
+
+    That is SCVersioning's settings (except the root and banner main refs, compared by read_state() and _state_menu()),
+    the versions of this extension and Sphinx, and master's commit if its conf.py or templates are used by all versions.
+
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+
+    :return: Hex digest.
+    :rtype: str
+    """
+    config = Config.from_context()
+    settings = [i for i in config if i[0] not in STATE_IGNORED_SETTINGS]
+    master = None
+    if config.use_master_conf or config.use_master_templates:
+        master = [r["sha"] for r in versions.remotes if r["name"] == "master"]
+    return hashlib.sha256(
+        json.dumps(
+            dict(
+                master=master,
+                settings=settings,
+                software=[__version__, sphinx.__version__],
+            ),
+            default=repr,
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _state_menu(versions):
+    """Hash what the versions list and banner in every page are rendered from, for --changed-only.
+
+    That is the name, kind, root directory, master_doc and documents of all versions in order and the banner main ref.
+    None with --versions-json since pages don't contain the list then.
+
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+
+    :return: Hex digest or None.
+    :rtype: str
+    """
+    config = Config.from_context()
+    if config.versions_json:
+        return None
+    return hashlib.sha256(
+        json.dumps(
+            dict(
+                banner=config.banner_main_ref,
+                versions=_menu_entries(versions.remotes),
+            ),
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def read_state(destination, versions):
+    """Find versions that are already built and up to date in `destination`, for --changed-only.
+
+    Reads the state file written to `destination` by write_state() at the end of the previous build. A version is up to
+    date if its commit and kind are the same and its output is still there. Nothing is up to date if settings or
+    software versions changed. Whether the versions list in its pages is still the same is checked by pre_build().
+
+    Versions that failed in the previous build are removed from `versions` if their commit is still the same, they
+    would only fail again and change every other version's versions list.
+
+    :param str destination: Destination directory of the build.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+
+    :return: Up to date versions' state entries in "refs" keyed by name, "root" (None if the root is out of date) and
+        the commits of all versions in "shas".
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    unchanged = dict(
+        listing=None,
+        refs=dict(),
+        root=None,
+        shas={r["name"]: r["sha"] for r in versions.remotes},
+    )
+    try:
+        with open(os.path.join(destination, STATE_FILE)) as handle:
+            state = json.load(handle)
+    except (IOError, ValueError):
+        log.info("No previous build state found in destination, building everything.")
+        return unchanged
+
+    root_remote = versions[Config.from_context().root_ref]
+    try:
+        if state["config"] != _state_config(versions):
+            log.info("Settings changed since the previous build, building everything.")
+            return unchanged
+        failed = [
+            r
+            for r in versions.remotes
+            if r["name"] != root_remote["name"]
+            and state.get("failed", dict()).get(r["name"]) == r["sha"]
+        ]
+        refs = dict()
+        for remote in versions.remotes:
+            entry = state["refs"].get(remote["name"])
+            if (
+                entry
+                and entry["sha"] == remote["sha"]
+                and entry["kind"] == remote["kind"]
+                and os.path.isdir(os.path.join(destination, entry["root_dir"]))
+            ):
+                refs[remote["name"]] = entry
+        root = state["root"]
+        if [root["name"], root["sha"]] != [root_remote["name"], root_remote["sha"]]:
+            root = None
+    except (AttributeError, KeyError, TypeError):
+        log.info("Previous build state is not valid, building everything.")
+        return unchanged
+
+    if failed:
+        log.warning(
+            "Failed in the previous build at the same commit, skipping: %s",
+            " ".join(r["name"] for r in failed),
         )
-        code_version = f"master ({remote['sha8']})" if remote["name"] == "master" else remote["name"]
-        os.environ["code_version"] = code_version
-        build(source, destination, versions, remote["name"], True)
-        os.environ.pop("code_version")
-
-        # Build all refs.
-        for remote in list(versions.remotes):
-            log.info("Building ref: %s", remote["name"])
-            source = os.path.dirname(
-                os.path.join(exported_root, remote["sha"], remote["conf_rel_path"])
+        for remote in failed:
+            versions.remotes.pop(versions.remotes.index(remote))
+    unchanged["refs"] = refs
+    unchanged["root"] = root
+
+    changed = [r["name"] for r in versions.remotes if r["name"] not in unchanged["refs"]]
+    log.info("Changed or new since the previous build: %s", " ".join(changed) or "none")
+    return unchanged
+
+
+def write_state(destination, versions, unchanged):
+    """Record the commit and pre-build values of every version built into `destination`, for --changed-only.
+
+    Versions that failed are only recorded with their commit, so they are tried again once it changes.
+
+    :param str destination: Destination directory of the build.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param dict unchanged: Output of read_state() passed to pre_build() and build_all().
+    """
+    menu = _state_menu(versions)
+    root_remote = versions[Config.from_context().root_ref]
+    refs = dict()
+    for remote in versions.remotes:
+        refs[remote["name"]] = unchanged["refs"].get(remote["name"]) or dict(
+            found_docs=list(remote["found_docs"]),
+            kind=remote["kind"],
+            master_doc=remote["master_doc"],
+            menu=menu,
+            root_dir=remote["root_dir"],
+            sha=remote["sha"],
+        )
+    root = unchanged["root"] or dict(
+        listing=unchanged["listing"],
+        menu=menu,
+        name=root_remote["name"],
+        sha=root_remote["sha"],
+    )
+    failed = {n: s for n, s in unchanged["shas"].items() if n not in refs}
+    state = dict(config=_state_config(versions), failed=failed, refs=refs, root=root)
+    with open(os.path.join(destination, STATE_FILE), "w") as handle:
+        json.dump(state, handle, sort_keys=True)
+
+
+def _add_timing(totals, record):
+    """Add a Timings record to totals of the same phase or step.
+
+    :param dict totals: Totals to update.
+    :param dict record: From Timings.records.
+    """
+    totals["count"] = totals.get("count", 0) + 1
+    totals["cpu"] = round(totals.get("cpu", 0) + record["cpu"], 3)
+    totals["wall"] = round(totals.get("wall", 0) + record["wall"], 3)
+    if record["peak_rss"] is not None:
+        totals["peak_rss"] = max(totals.get("peak_rss", 0), record["peak_rss"])
+
+
+def write_timings(path, versions):
+    """Write the --timings JSON report and log a summary of all phases and the slowest refs.
+
+    Export and mtimes steps are measured per commit and count towards every ref at that commit.
+
+    :param str path: JSON file to write.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    """
+    log = logging.getLogger(__name__)
+    end = usage()
+    names = dict()
+    for remote in versions.remotes:
+        names.setdefault(remote["sha"], list()).append(remote["name"])
+    phases, refs = dict(), dict()
+    for record in TIMINGS.records:
+        if record["ref"] is None:
+            _add_timing(phases.setdefault(record["step"], dict()), record)
+            continue
+        for name in names.get(record["ref"], [record["ref"]]):
+            steps = refs.setdefault(name, dict(steps=dict(), wall=0))
+            _add_timing(steps["steps"].setdefault(record["step"], dict()), record)
+            steps["wall"] = round(steps["wall"] + record["wall"], 3)
+    total = dict(
+        cpu=round(end[1] - TIMINGS.start[1], 3),
+        peak_rss=end[2],
+        wall=round(end[0] - TIMINGS.start[0], 3),
+    )
+    report = dict(phases=phases, records=TIMINGS.records, refs=refs, total=total)
+    with open(path, "w") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+
+    # Summary.
+    def row(name, values):
+        """Format one table row."""
+        return "{:<24}".format(name) + "".join(
+            "{:>12}".format("-" if v is None else v) for v in values
+        )
+
+    def rss(kib):
+        """Format KiB as MiB."""
+        return None if kib is None else "{:.0f}".format(kib / 1024.0)
+
+    log.info("Timings written to %s", path)
+    log.info(row("Phase", ["wall s", "CPU s", "peak MiB"]))
+    for name, totals in itertools.chain(phases.items(), [("total", total)]):
+        log.info(
+            row(
+                name,
+                [
+                    "{:.2f}".format(totals["wall"]),
+                    "{:.2f}".format(totals["cpu"]),
+                    rss(totals.get("peak_rss")),
+                ],
             )
-            target = os.path.join(destination, remote["root_dir"])
-            try:
-                code_version = f"master ({remote['sha8']})" if remote["name"] == "master" else remote["name"]
-                os.environ["code_version"] = code_version
-                build(source, target, versions, remote["name"], False)
-                os.environ.pop("code_version")
-            except HandledError:
-                log.warning(
-                    "Skipping. Will not be building %s. Rebuilding everything.",
-                    remote["name"],
-                )
-                versions.remotes.pop(versions.remotes.index(remote))
-                break  # Break out of for loop.
-        else:
-            break  # Break out of while loop if for loop didn't execute break statement above.
+        )
+    columns = [s for s in TIMINGS_STEPS if any(s in r["steps"] for r in refs.values())]
+    slowest = sorted(refs.items(), key=lambda i: -i[1]["wall"])[:10]
+    log.info(row("Slowest refs (wall s)", ["total"] + columns))
+    for name, totals in slowest:
+        steps = totals["steps"]
+        log.info(
+            row(
+                name[:23],
+                ["{:.2f}".format(totals["wall"])]
+                + [
+                    "{:.2f}".format(steps[c]["wall"]) if c in steps else None
+                    for c in columns
+                ],
+            )
+        )
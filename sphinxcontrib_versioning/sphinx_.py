@@ -1,25 +1,65 @@
 """Interface with Sphinx."""
 
+import base64
+import contextlib
+import cProfile
 import datetime
+import hashlib
+import html
+import json
 import logging
 import multiprocessing
 import os
+import pickle
+import shutil
 import sys
+from queue import SimpleQueue
 
 from sphinx import application, locale
+from sphinx.application import ENV_PICKLE_FILENAME
 from sphinx.cmd.build import build_main
 from sphinx.builders.html import StandaloneHTMLBuilder
 from sphinx.config import Config as SphinxConfig
 from sphinx.errors import SphinxError
 from sphinx.jinja2glue import SphinxFileSystemLoader
+from sphinx.project import Project
 from sphinx.util.i18n import format_date
+from sphinx.util.tags import Tags
 
 from sphinxcontrib_versioning import __version__
-from sphinxcontrib_versioning.lib import Config, HandledError, TempDir
+from sphinxcontrib_versioning.lib import Config, HandledError, TempDir, WorkerPool
 from sphinxcontrib_versioning.versions import Versions
 
+PROBE_SAFE_EXTENSIONS = (
+    "sphinx.ext.autodoc",
+    "sphinx.ext.autosectionlabel",
+    "sphinx.ext.coverage",
+    "sphinx.ext.doctest",
+    "sphinx.ext.duration",
+    "sphinx.ext.extlinks",
+    "sphinx.ext.githubpages",
+    "sphinx.ext.graphviz",
+    "sphinx.ext.ifconfig",
+    "sphinx.ext.imgconverter",
+    "sphinx.ext.imgmath",
+    "sphinx.ext.inheritance_diagram",
+    "sphinx.ext.intersphinx",
+    "sphinx.ext.linkcode",
+    "sphinx.ext.mathjax",
+    "sphinx.ext.napoleon",
+    "sphinx.ext.todo",
+    "sphinx.ext.viewcode",
+)
+PAGENAME_PLACEHOLDER = "scv-pagename-placeholder"
+LOADED_VERSIONS = dict()  # Versions and digests by file path, filled by store_versions() and _load_versions().
 SC_VERSIONING_VERSIONS = list()  # Updated after forking.
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "_static")
+STATIC_JSON_DIR = os.path.join(os.path.dirname(__file__), "_static_json")
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "_templates")
+VERSIONS_JSON = "versions.json"
+VERSIONS_JSON_KEYS = ("kind", "master_doc", "name", "root_dir")
+VERSIONS_FILES = dict()  # Paths keyed by SHA256 digest (None: directory), written by store_versions().
+WORKER_POOLS = dict()  # Keyed by max_worker_jobs, created by _start().
 
 
 class EventHandlers(object):
@@ -30,9 +70,12 @@ class EventHandlers(object):
     :ivar str BANNER_MAIN_VERSION: Banner URLs point to this remote name (from Versions.__getitem__()).
     :ivar bool BANNER_RECENT_TAG: Banner URLs point to most recently committed tag.
     :ivar str CURRENT_VERSION: Current version being built.
+    :ivar bool CUSTOM_TEMPLATES: Templates rendered by render_fragments() are not this extension's (None: unknown).
+    :ivar dict FRAGMENTS: Rendered sidebar and banner HTML cached by render_fragments().
     :ivar bool IS_ROOT: Value for context['scv_is_root'].
     :ivar bool SHOW_BANNER: Display the banner.
     :ivar sphinxcontrib_versioning.versions.Versions VERSIONS: Versions class instance.
+    :ivar bool VERSIONS_JSON: Populate the sidebar and banner in the browser from versions.json.
     """
 
     ABORT_AFTER_READ = None
@@ -40,21 +83,29 @@ class EventHandlers(object):
     BANNER_MAIN_VERSION = None
     BANNER_RECENT_TAG = False
     CURRENT_VERSION = None
+    CUSTOM_TEMPLATES = None
+    FRAGMENTS = dict()
     IS_ROOT = False
     SHOW_BANNER = False
     VERSIONS = None
+    VERSIONS_JSON = False
 
-    @staticmethod
-    def builder_inited(app):
+    @classmethod
+    def builder_inited(cls, app):
         """Update the Sphinx builder.
 
         :param sphinx.application.Sphinx app: Sphinx application object.
         """
         # Add this extension's _templates directory to Sphinx.
-        templates_dir = os.path.join(os.path.dirname(__file__), "_templates")
-        app.builder.templates.pathchain.insert(0, templates_dir)
-        app.builder.templates.loaders.insert(0, SphinxFileSystemLoader(templates_dir))
+        app.builder.templates.pathchain.insert(0, TEMPLATES_DIR)
+        app.builder.templates.loaders.insert(0, SphinxFileSystemLoader(TEMPLATES_DIR))
         app.builder.templates.templatepathlen += 1
+        cls.CUSTOM_TEMPLATES = None  # Other extensions may still add loaders in front of this one.
+        cls.FRAGMENTS.clear()  # Rendered by another app's templates if this process built before (WorkerPool).
+        if cls.VERSIONS_JSON:  # Only copied into _static with --versions-json.
+            if STATIC_JSON_DIR not in app.config.html_static_path:
+                app.config.html_static_path.append(STATIC_JSON_DIR)
+            app.add_js_file("versions.js")
 
         # Add versions.html to sidebar.
         if "**" not in app.config.html_sidebars:
@@ -71,19 +122,85 @@ class EventHandlers(object):
     def env_updated(cls, app, env):
         """Abort Sphinx after initializing config and discovering all pages to build.
 
+        Pickles the environment first (Sphinx would only do that after this event) so the real build can reuse the
+        doctrees read here.
+
         :param sphinx.application.Sphinx app: Sphinx application object.
         :param sphinx.environment.BuildEnvironment env: Sphinx build environment.
         """
         if cls.ABORT_AFTER_READ:
+            os.makedirs(app.doctreedir, exist_ok=True)
+            with open(os.path.join(app.doctreedir, ENV_PICKLE_FILENAME), "wb") as handle:
+                pickle.dump(env, handle, pickle.HIGHEST_PROTOCOL)
             config = {
                 n: getattr(app.config, n)
                 for n in (a for a in dir(app.config) if a.startswith("scv_"))
             }
-            config["found_docs"] = tuple(str(d) for d in env.found_docs)
-            config["master_doc"] = str(app.config.master_doc)
+            config["found_docs"] = tuple(sorted(str(d) for d in env.found_docs))
+            config["master_doc"] = str(app.config.root_doc)  # Sphinx 4 renamed it.
             cls.ABORT_AFTER_READ.put(config)
             sys.exit(0)
 
+    @classmethod
+    def render_fragments(cls, app, pagename, context):
+        """Render the versions.html sidebar and banner.html for a page, reusing HTML rendered for previous pages.
+
+        Between pages of one version these only differ by the relative path prefix (directory depth) and by which
+        versions have the page. So they're rendered once for each of those combinations with a placeholder page name,
+        which is then replaced with the real one. With versions.json they don't differ at all. Templates that are not
+        this extension's own (e.g. from a loader another extension added in front of it) may use anything from the
+        page's context, those are rendered for every page.
+
+        :param sphinx.application.Sphinx app: Sphinx application object.
+        :param str pagename: Name of the page being rendered (without .html or any file extension).
+        :param dict context: Jinja2 HTML context, already updated by html_page_context().
+
+        :return: Sidebar and banner HTML (empty string if the banner is disabled).
+        :rtype: tuple
+        """
+        versions = cls.VERSIONS
+        if cls.VERSIONS_JSON:
+            depth, exists = None, None
+            templates = ("scv_versions_json.html", "scv_banner_json.html")
+        else:
+            depth = pagename.count("/")
+            exists = tuple(e for _, _, e in versions.links)
+            templates = ("scv_versions.html", "banner.html")
+        if cls.CUSTOM_TEMPLATES is None:
+            environment = app.builder.templates.environment
+            cls.CUSTOM_TEMPLATES = any(
+                os.path.dirname(environment.get_template(t).filename) != TEMPLATES_DIR
+                for t in templates
+            )
+        if cls.CUSTOM_TEMPLATES:
+            return (
+                app.builder.templates.render(templates[0], context),
+                app.builder.templates.render(templates[1], context)
+                if cls.SHOW_BANNER
+                else "",
+            )
+        placeholder = "/".join([PAGENAME_PLACEHOLDER] * ((depth or 0) + 1))
+        key = (cls.CURRENT_VERSION, cls.IS_ROOT, depth, exists)
+        fragments = cls.FRAGMENTS.get(key)
+        if fragments is None:
+            versions.context = dict(context, pagename=placeholder)
+            if exists is not None:
+                versions.prime_links(exists)
+            try:
+                fragments = cls.FRAGMENTS[key] = (
+                    app.builder.templates.render(templates[0], versions.context),
+                    app.builder.templates.render(templates[1], versions.context)
+                    if cls.SHOW_BANNER
+                    else "",
+                )
+            finally:
+                versions.context = context
+        basename = pagename.split("/")[-1]
+        return tuple(
+            f.replace(placeholder, pagename).replace(PAGENAME_PLACEHOLDER, basename)
+            for f in fragments
+        )
+
     @classmethod
     def html_page_context(cls, app, pagename, templatename, context, doctree):
         """Update the Jinja2 HTML context, exposes the Versions class instance to it.
@@ -130,10 +247,25 @@ class EventHandlers(object):
         context["vhasdoc"] = versions.vhasdoc
         context["vpathto"] = versions.vpathto
 
-        # Insert banner into body.
+        # Tell _static/versions.js where to find versions.json and which page this is.
+        if cls.VERSIONS_JSON:
+            manifest = "../" * pagename.count("/") + ("" if cls.IS_ROOT else "../")
+            context["metatags"] = context.get("metatags", "") + "".join(
+                '\n<meta name="scv-{}" content="{}" />'.format(n, html.escape(v))
+                for n, v in (
+                    ("versions-json", manifest + VERSIONS_JSON),
+                    ("current-version", cls.CURRENT_VERSION),
+                    ("is-root", "true" if cls.IS_ROOT else "false"),
+                    ("pagename", pagename),
+                )
+            )
+
+        # Render sidebar and insert banner into body.
+        context["scv_versions_html"], banner = cls.render_fragments(
+            app, pagename, context
+        )
         if cls.SHOW_BANNER and "body" in context:
-            parsed = app.builder.templates.render("banner.html", context)
-            context["body"] = parsed + context["body"]
+            context["body"] = banner + context["body"]
             # Handle overridden css_files.
             css_files = context.setdefault("css_files", list())
             if "_static/banner.css" not in css_files:
@@ -192,15 +324,73 @@ class ConfigInject(SphinxConfig):
         self.extensions.append("sphinxcontrib_versioning.sphinx_")
 
 
-def _build(argv, config, versions, current_name, is_root):
+@contextlib.contextmanager
+def _profile(config, current_name, kind):
+    """Profile the code this wraps with cProfile if --profile-dir is set, even if it raises.
+
+    Stats are written in pstats format to PROFILE_DIR/<ref>.<kind>.pstats, with a number added if the same ref and kind
+    were profiled before in this run (e.g. builds repeated after another ref failed).
+
+    :param sphinxcontrib_versioning.lib.Config config: Runtime configuration.
+    :param str current_name: The ref name of the current version being built.
+    :param str kind: Which child process this is: read, build or root.
+    """
+    if not config.profile_dir:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(config.profile_dir, exist_ok=True)
+        stem = os.path.join(
+            config.profile_dir, "{}.{}".format(current_name.replace("/", "_"), kind)
+        )
+        path, number = stem + ".pstats", 1
+        while os.path.exists(path):
+            number += 1
+            path = "{}.{}.pstats".format(stem, number)
+        profiler.dump_stats(path)
+
+
+def _build(
+    argv,
+    config,
+    versions,
+    current_name,
+    is_root,
+    environ=None,
+    log_path=None,
+    doctree_dir=None,
+):
     """Build Sphinx docs via multiprocessing for isolation.
 
     :param tuple argv: Arguments to pass to Sphinx.
     :param sphinxcontrib_versioning.lib.Config config: Runtime configuration.
-    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param versions: Versions class instance, or path to one written by store_versions().
     :param str current_name: The ref name of the current version being built.
     :param bool is_root: Is this build in the web root?
+    :param dict environ: Environment variables to set in this process before running Sphinx.
+    :param str log_path: Redirect stdout and stderr to this file instead of the console.
+    :param str doctree_dir: Use this doctree directory and copy it to the output's .doctrees afterwards.
     """
+    # Redirect output.
+    if log_path:
+        handle = open(log_path, "w")
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(handle.fileno(), 1)
+        os.dup2(handle.fileno(), 2)
+        sys.stdout = sys.stderr = handle
+    if environ:
+        os.environ.update(environ)
+    if isinstance(versions, str):
+        versions, digest = _load_versions(versions)
+    else:
+        digest = None
+
     # Patch.
     application.Config = ConfigInject
     if config.show_banner:
@@ -208,15 +398,25 @@ def _build(argv, config, versions, current_name, is_root):
         EventHandlers.BANNER_MAIN_VERSION = config.banner_main_ref
         EventHandlers.BANNER_RECENT_TAG = config.banner_recent_tag
         EventHandlers.SHOW_BANNER = True
+    else:  # This process may have run another build before (WorkerPool).
+        EventHandlers.BANNER_GREATEST_TAG = False
+        EventHandlers.BANNER_MAIN_VERSION = None
+        EventHandlers.BANNER_RECENT_TAG = False
+        EventHandlers.SHOW_BANNER = False
     EventHandlers.CURRENT_VERSION = current_name
     EventHandlers.IS_ROOT = is_root
     EventHandlers.VERSIONS = versions
-    SC_VERSIONING_VERSIONS[:] = [
-        p
-        for r in versions.remotes
-        for p in sorted(r.items())
-        if p[0] not in ("sha", "date")
-    ]
+    EventHandlers.VERSIONS_JSON = config.versions_json
+    if config.versions_json:  # Pages only link to their own version.
+        SC_VERSIONING_VERSIONS[:] = [
+            p
+            for r in versions.remotes
+            if r["name"] == current_name
+            for p in sorted(r.items())
+            if p[0] not in ("sha", "date")
+        ]
+    else:  # Pages link to all versions, rewrite them all if any version changed.
+        SC_VERSIONING_VERSIONS[:] = [digest] if digest else []
 
     # Update argv.
     if config.verbose > 1:
@@ -225,61 +425,264 @@ def _build(argv, config, versions, current_name, is_root):
         argv += ("-N",)
     if config.overflow:
         argv += config.overflow
+    if doctree_dir:
+        argv += ("-d", doctree_dir)
 
     # Build.
-    result = build_main(argv)
+    if EventHandlers.ABORT_AFTER_READ:  # Profiled by _read_config().
+        result = build_main(argv)
+    else:
+        with _profile(config, current_name, "root" if is_root else "build"):
+            result = build_main(argv)
     if result != 0:
         raise SphinxError
+    if doctree_dir:  # Same output as without -d.
+        shutil.copytree(
+            doctree_dir, os.path.join(argv[1], ".doctrees"), dirs_exist_ok=True
+        )
+
+
+def _probe_config(source, config):
+    """Evaluate conf.py and discover documents the way Sphinx does, without running Sphinx or parsing any document.
+
+    Only possible when nothing but conf.py decides which documents exist: no sphinx-build overflow arguments, no setup()
+    function in conf.py and only extensions from PROBE_SAFE_EXTENSIONS (extensions may register source parsers or
+    generate documents).
+
+    :param str source: Source directory with conf.py.
+    :param sphinxcontrib_versioning.lib.Config config: Runtime configuration.
 
+    :return: Same as EventHandlers.env_updated() sends to the parent process, or None if a full read is required.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    if config.overflow:
+        log.debug("Not probing config, sphinx-build arguments: %s", config.overflow)
+        return None
+    try:
+        sphinx_config = SphinxConfig.read(os.path.abspath(source), tags=Tags())
+    except Exception as exc:  # Let the full read report it.
+        log.debug("Not probing config, failed to evaluate conf.py: %s", exc)
+        return None
+    raw = sphinx_config._raw_config
+    unsafe = [e for e in raw.get("extensions", ()) if e not in PROBE_SAFE_EXTENSIONS]
+    if unsafe or callable(raw.get("setup")):
+        log.debug("Not probing config, extensions or setup() in conf.py: %s", unsafe)
+        return None
+
+    # Same as sphinx.config.convert_source_suffix().
+    source_suffix = raw.get("source_suffix", {".rst": "restructuredtext"})
+    if isinstance(source_suffix, str):
+        source_suffix = {source_suffix: "restructuredtext"}
+    elif not isinstance(source_suffix, dict):
+        source_suffix = dict.fromkeys(source_suffix, "restructuredtext")
+
+    # Same as BuildEnvironment.find_files() with the HTML builder.
+    exclude_paths = (
+        list(raw.get("exclude_patterns", []))
+        + list(raw.get("templates_path", []))
+        + list(raw.get("html_extra_path", []))
+        + list(raw.get("html_static_path", []))
+    )
+    include_paths = raw.get("include_patterns", ["**"])
+    found_docs = Project(source, source_suffix).discover(exclude_paths, include_paths)
 
-def _read_config(argv, config, current_name, queue):
+    names = {"scv_{}".format(n) for n, _ in Config()}  # Registered by setup().
+    probed = {k: v for k, v in raw.items() if k in names}
+    probed["found_docs"] = tuple(sorted(str(d) for d in found_docs))
+
+    # Same as the root_doc config value defaulting to master_doc, and sphinx.config.check_root_doc().
+    root_doc = str(raw.get("root_doc", raw.get("master_doc", "index")))
+    if root_doc == "index" and "index" not in found_docs and "contents" in found_docs:
+        root_doc = "contents"
+    probed["master_doc"] = root_doc
+    return probed
+
+
+def _read_config(argv, config, current_name, queue=None):
     """Read the Sphinx config via multiprocessing for isolation.
 
+    Tries _probe_config() first and only runs Sphinx's read phase when that is not possible.
+
     :param tuple argv: Arguments to pass to Sphinx.
     :param sphinxcontrib_versioning.lib.Config config: Runtime configuration.
     :param str current_name: The ref name of the current version being built.
-    :param multiprocessing.queues.Queue queue: Communication channel to parent process.
+    :param multiprocessing.queues.Queue queue: Communication channel to parent process. None in a WorkerPool.
+
+    :return: Config values if queue is None.
+    :rtype: dict
     """
-    # Patch.
-    EventHandlers.ABORT_AFTER_READ = queue
+    with _profile(config, current_name, "read"):
+        probed = _probe_config(argv[0], config)
+        if probed is not None:
+            if queue is None:
+                return probed
+            queue.put(probed)
+            return None
+
+        # Patch.
+        results = SimpleQueue() if queue is None else queue
+        EventHandlers.ABORT_AFTER_READ = results
+
+        # Run.
+        try:
+            _build(argv, config, Versions(list()), current_name, False)
+        except SystemExit as exc:  # From EventHandlers.env_updated().
+            if exc.code or queue is not None:
+                raise
+        finally:
+            EventHandlers.ABORT_AFTER_READ = None
+        return results.get_nowait() if queue is None else None
+
+
+def store_versions(versions):
+    """Pickle a Versions instance to a file once instead of sending a copy of it to every sphinx-build child process.
+
+    Callers store it once and pass the returned path to spawn_build() or build(), and call this again after changing
+    versions. Files are named after the SHA256 of their contents, so a new one is written whenever anything changed
+    since the last call, even remote dicts modified in place (e.g. root_dir and found_docs set by pre_build()). Children
+    forked afterwards inherit a snapshot in LOADED_VERSIONS and don't read the file at all, WorkerPool workers forked
+    before the file was written read it once.
 
-    # Run.
-    _build(argv, config, Versions(list()), current_name, False)
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
 
+    :return: Path to pass to spawn_build(), build() or _build().
+    :rtype: str
+    """
+    data = pickle.dumps(versions, pickle.HIGHEST_PROTOCOL)
+    digest = hashlib.sha256(data).hexdigest()
+    if digest in VERSIONS_FILES:
+        return VERSIONS_FILES[digest]
 
-def build(source, target, versions, current_name, is_root):
-    """Build Sphinx docs for one version. Includes Versions class instance with names/urls in the HTML context.
+    if None in VERSIONS_FILES:
+        directory = VERSIONS_FILES[None]
+    else:
+        directory = VERSIONS_FILES[None] = TempDir(True).name
+    path = os.path.join(directory, "{}.pickle".format(digest))
+    if not os.path.exists(path):
+        with open(path + ".tmp", "wb") as handle:
+            handle.write(data)
+        os.replace(path + ".tmp", path)
 
-    :raise HandledError: If sphinx-build fails. Will be logged before raising.
+    LOADED_VERSIONS[path] = pickle.loads(data), digest  # Not versions itself, it may still change in place.
+    VERSIONS_FILES[digest] = path
+    return path
+
+
+def _load_versions(path):
+    """Load a Versions instance written by store_versions(), once per process.
+
+    :param str path: Versions pickle file.
+
+    :return: Versions class instance and SHA256 hex digest of the file.
+    :rtype: tuple
+    """
+    if path not in LOADED_VERSIONS:
+        with open(path, "rb") as handle:
+            data = handle.read()
+        LOADED_VERSIONS[path] = pickle.loads(data), hashlib.sha256(data).hexdigest()
+    return LOADED_VERSIONS[path]
+
+
+def _start(func, args, config):
+    """Run a function in a child process: a new one, or a reused WorkerPool worker if --max-worker-jobs is over 1.
+
+    :param function func: Module level function to run.
+    :param tuple args: Positional arguments for func.
+    :param sphinxcontrib_versioning.lib.Config config: Runtime configuration.
+
+    :return: Started multiprocessing.Process or PoolJob. Both have sentinel, join(), exitcode and terminate().
+    """
+    if config.max_worker_jobs < 2:
+        child = multiprocessing.Process(target=func, args=args)
+        child.start()
+        return child
+    if config.max_worker_jobs not in WORKER_POOLS:
+        WORKER_POOLS[config.max_worker_jobs] = WorkerPool(config.max_worker_jobs)
+    picklable = Config()  # Without program state, which may hold Click callbacks.
+    picklable.update(dict(config))
+    args = tuple(picklable if a is config else a for a in args)
+    return WORKER_POOLS[config.max_worker_jobs].submit(func, args)
+
+
+def spawn_build(
+    source,
+    target,
+    versions,
+    current_name,
+    is_root,
+    environ=None,
+    log_path=None,
+    doctree_dir=None,
+):
+    """Start sphinx-build for one version in a child process without waiting for it to finish.
 
     :param str source: Source directory to pass to sphinx-build.
     :param str target: Destination directory to write documentation to (passed to sphinx-build).
-    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    :param versions: Versions class instance, or path to one written by store_versions().
     :param str current_name: The ref name of the current version being built.
     :param bool is_root: Is this build in the web root?
+    :param dict environ: Environment variables to set in the child process.
+    :param str log_path: Write sphinx-build's console output to this file instead of the console.
+    :param str doctree_dir: Reuse the environment and doctrees in this directory (e.g. from read_config()).
+
+    :return: The started child process (see _start()).
+    :rtype: multiprocessing.Process
     """
     log = logging.getLogger(__name__)
     argv = (source, target)
     config = Config.from_context()
 
     log.debug("Running sphinx-build for %s with args: %s", current_name, str(argv))
-    child = multiprocessing.Process(
-        target=_build, args=(argv, config, versions, current_name, is_root)
+    return _start(
+        _build,
+        (
+            argv,
+            config,
+            versions if isinstance(versions, str) else store_versions(versions),
+            current_name,
+            is_root,
+            environ,
+            log_path,
+            doctree_dir,
+        ),
+        config,
+    )
+
+
+def build(
+    source, target, versions, current_name, is_root, environ=None, doctree_dir=None
+):
+    """Build Sphinx docs for one version. Includes Versions class instance with names/urls in the HTML context.
+
+    :raise HandledError: If sphinx-build fails. Will be logged before raising.
+
+    :param str source: Source directory to pass to sphinx-build.
+    :param str target: Destination directory to write documentation to (passed to sphinx-build).
+    :param versions: Versions class instance, or path to one written by store_versions().
+    :param str current_name: The ref name of the current version being built.
+    :param bool is_root: Is this build in the web root?
+    :param dict environ: Environment variables to set in the child process.
+    :param str doctree_dir: Reuse the environment and doctrees in this directory (e.g. from read_config()).
+    """
+    log = logging.getLogger(__name__)
+    child = spawn_build(
+        source, target, versions, current_name, is_root, environ, None, doctree_dir
     )
-    child.start()
     child.join()  # Block.
     if child.exitcode != 0:
         log.error("sphinx-build failed for branch/tag: %s", current_name)
         raise HandledError
 
 
-def read_config(source, current_name):
+def read_config(source, current_name, doctree_dir=None):
     """Read the Sphinx config for one version.
 
     :raise HandledError: If sphinx-build fails. Will be logged before raising.
 
     :param str source: Source directory to pass to sphinx-build.
     :param str current_name: The ref name of the current version being built.
+    :param str doctree_dir: Keep the environment and doctrees here if documents had to be read.
 
     :return: Specific Sphinx config values.
     :rtype: dict
@@ -290,11 +693,12 @@ def read_config(source, current_name):
 
     with TempDir() as temp_dir:
         argv = (source, temp_dir)
+        if doctree_dir:
+            argv += ("-d", doctree_dir)
         log.debug("Running sphinx-build for config values with args: %s", str(argv))
-        child = multiprocessing.Process(
-            target=_read_config, args=(argv, config, current_name, queue)
-        )
-        child.start()
+        pooled = config.max_worker_jobs > 1
+        args = (argv, config, current_name) + (() if pooled else (queue,))
+        child = _start(_read_config, args, config)
         child.join()  # Block.
         if child.exitcode != 0:
             log.error(
@@ -303,5 +707,35 @@ def read_config(source, current_name):
             )
             raise HandledError
 
-    config = queue.get()
+    config = child.value if pooled else queue.get()
     return config
+
+
+def write_versions_json(destination, versions):
+    """Write the list of versions to versions.json in the web root, read by _static/versions.js in the browser.
+
+    Document names of all versions are listed once in "pages". Each version's documents are a base64 encoded bitmap
+    of positions in that list (FoundDocs.bitmap).
+
+    :param str destination: Destination directory with all built docs.
+    :param sphinxcontrib_versioning.versions.Versions versions: Versions class instance.
+    """
+    config = Config.from_context()
+    versions.pack_found_docs()
+    manifest = dict(
+        banner=(
+            dict(main_version=config.banner_main_ref) if config.show_banner else None
+        ),
+        pages=list(versions.page_table.names),
+        versions=[
+            dict(
+                {k: r[k] for k in VERSIONS_JSON_KEYS},
+                found_docs=base64.b64encode(r["found_docs"].bitmap).decode("ascii"),
+            )
+            for r in versions.remotes
+        ],
+    )
+    path = os.path.join(destination, VERSIONS_JSON)
+    logging.getLogger(__name__).debug("Writing %s", path)
+    with open(path, "w") as handle:
+        json.dump(manifest, handle, sort_keys=True)
@@ -1,5 +1,8 @@
 """Collect and sort version strings."""
 
+import bisect
+import collections.abc
+import posixpath
 import re
 
 RE_SEMVER = re.compile(
@@ -7,88 +10,194 @@ RE_SEMVER = re.compile(
 )
 
 
-def semvers(names):
-    """Parse versions into integers and convert non-integer meta indicators into integers with ord().
+def semver_key(name):
+    """Parse a version into a sort key. Sorting by it puts the highest valid version first and invalid ones last.
+
+    Integers are inverted (see multi_sort() docstring). Non-integer meta indicators (e.g. "b3" in v1.10.0b3) are kept as
+    a string, which compares the same as their ord() values padded with zeros would: v1.0.0 before v1.0.0a before
+    v1.0.0b3.
+
+    :param str name: String representing a version/tag/branch.
+
+    :return: E.g. v1.10.0b3 -> (0, -1, -10, 0, 0, 0, 0, 0, 'b3'). (1,) if not a valid version.
+    :rtype: tuple
+    """
+    match = RE_SEMVER.search(name)
+    if not match:
+        return (1,)
+    groups = match.groups()
+    return (0, *[-int(i) if i else 0 for i in groups[:-1]], groups[-1])
 
-    Each return list item has an indicator as the first item. 0 for valid versions and 1 for invalid. Can be used to
-    sort non-version names (e.g. master, feature_branch, etc) after valid versions. No sorting is done in this function
-    though.
 
-    Read multi_sort() docstring for reasoning behind inverted integers in version_ints variable.
+def semvers(names):
+    """Parse versions into sort keys with semver_key().
 
     :param iter names: List of strings representing versions/tags/branches.
 
-    :return: List of parsed versions. E.g. v1.10.0b3 -> [0, 1, 10, 0, ord('b'), ord('3')]
+    :return: List of parsed versions.
     :rtype: list
     """
-    matches = [(RE_SEMVER.findall(n) or [[]])[0] for n in names]
-    max_len_ints = 0
-    max_len_str = 0
-
-    # Get max lens for padding.
-    for match in (m for m in matches if m):
-        max_len_ints = len(match)  # Never changes.
-        max_len_str = max(max_len_str, len(match[-1]))
-    if not max_len_ints:
-        return matches  # Nothing to do, all empty.
-    invalid_template = [1] + [0] * (max_len_ints + max_len_str - 1)
-
-    # Parse.
-    exploded_semver = list()
-    for match in matches:
-        if not match:
-            exploded_semver.append(invalid_template[:])
-            continue
-        version_ints = [-int(i or 0) for i in match[:-1]]
-        ints_of_str = [ord(i) for i in match[-1]] + [0] * (max_len_str - len(match[-1]))
-        exploded_semver.append([0] + version_ints + ints_of_str)
-
-    return exploded_semver
+    return [semver_key(n) for n in names]
+
+
+def _remote_semver(remote):
+    """Get the semver_key() of a remote, computed once and cached in it.
+
+    :param dict remote: From Versions().remotes.
+
+    :return: Sort key.
+    :rtype: tuple
+    """
+    try:
+        return remote["semver"]
+    except KeyError:
+        key = remote["semver"] = semver_key(remote["name"])
+        return key
+
+
+SORT_KEYS = dict(
+    alpha=lambda r: r["name"],
+    semver=_remote_semver,
+    time=lambda r: -r["date"],
+)
 
 
 def multi_sort(remotes, sort):
     """Sort `remotes` in place. Allows sorting by multiple conditions.
 
-    This is needed because Python 3 no longer supports sorting lists of multiple types. Sort keys must all be of the
-    same type.
-
     Problem: the user expects versions to be sorted latest first and timelogical to be most recent first (when viewing
     the HTML documentation), yet expects alphabetical sorting to be A before Z.
     Solution: invert integers (dates and parsed versions).
 
     :param iter remotes: List of dicts from Versions().remotes.
-    :param iter sort: What to sort by. May be one or more of: alpha, time, semver
+    :param iter sort: What to sort by. May be one or more of: alpha, time, semver. Others are ignored.
     """
-    exploded_alpha = list()
-    exploded_semver = list()
-
-    # Convert name to int if alpha is in sort.
-    if "alpha" in sort:
-        alpha_max_len = max(len(r["name"]) for r in remotes)
-        for name in (r["name"] for r in remotes):
-            exploded_alpha.append(
-                [ord(i) for i in name] + [0] * (alpha_max_len - len(name))
-            )
+    # Stable sorts from the last condition to the first equal one sort by all of them at once.
+    for getter in reversed([SORT_KEYS[s] for s in sort if s in SORT_KEYS]):
+        remotes.sort(key=getter)
+
+
+def _counts_changes(name):
+    """Wrap a list method to increment self.changes before calling it. Used by Remotes.
+
+    :param str name: Name of the list method.
+
+    :return: Wrapped method.
+    :rtype: function
+    """
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        """Increment self.changes and call the list method."""
+        self.changes += 1
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+class Remotes(list):
+    """List of remote dicts that counts changes made to it, so Versions knows when to rebuild its lookup indexes.
+
+    :ivar int changes: Incremented by every method that modifies the list.
+    """
+
+    changes = 0
+    __delitem__ = _counts_changes("__delitem__")
+    __iadd__ = _counts_changes("__iadd__")
+    __imul__ = _counts_changes("__imul__")
+    __setitem__ = _counts_changes("__setitem__")
+    append = _counts_changes("append")
+    clear = _counts_changes("clear")
+    extend = _counts_changes("extend")
+    insert = _counts_changes("insert")
+    pop = _counts_changes("pop")
+    remove = _counts_changes("remove")
+    reverse = _counts_changes("reverse")
+    sort = _counts_changes("sort")
+
+
+class PageTable(object):
+    """Document names of all versions, stored once and shared by every version's FoundDocs.
+
+    :ivar tuple names: Sorted document names.
+    :ivar dict index: Position of every name in names.
+    """
+
+    def __init__(self, names):
+        """Constructor.
+
+        :param iter names: Document names, sorted and without duplicates.
+        """
+        self.names = tuple(names)
+        self.index = {n: i for i, n in enumerate(self.names)}
+
+    def __reduce__(self):
+        """Pickle just the names, the index is rebuilt when unpickled."""
+        return PageTable, (self.names,)
+
+    def found_docs(self, docnames):
+        """Create a FoundDocs for a version.
+
+        :param iter docnames: Documents in the version. All must be in the table.
+
+        :return: Set of docnames backed by a bitmap.
+        :rtype: FoundDocs
+        """
+        bitmap = bytearray((len(self.names) + 7) // 8)
+        for position in (self.index[d] for d in docnames):
+            bitmap[position >> 3] |= 1 << (position & 7)
+        return FoundDocs(self, bytes(bitmap))
+
+
+class FoundDocs(collections.abc.Set):
+    """Read-only set of documents in one version, one bit per document in a PageTable shared by all versions.
+
+    Hundreds of versions with tens of thousands of documents each take a few bytes per document in total instead of a
+    tuple of strings per version, and pickle the table only once along with all versions using it.
+
+    :ivar bytes bitmap: Bit n (little-endian within each byte) is set if table.names[n] is in the version.
+    :ivar PageTable table: Shared document names.
+    """
+
+    __slots__ = ("bitmap", "table", "_len")
 
-    # Parse versions if semver is in sort.
-    if "semver" in sort:
-        exploded_semver = semvers(r["name"] for r in remotes)
+    def __init__(self, table, bitmap):
+        """Constructor.
+
+        :param PageTable table: Shared document names.
+        :param bytes bitmap: One bit per name in the table.
+        """
+        self.bitmap = bitmap
+        self.table = table
+        self._len = sum(bin(b).count("1") for b in bitmap)
 
-    # Build sort_mapping dict.
-    sort_mapping = dict()
-    for i, remote in enumerate(remotes):
-        key = list()
-        for sort_by in sort:
-            if sort_by == "alpha":
-                key.extend(exploded_alpha[i])
-            elif sort_by == "time":
-                key.append(-remote["date"])
-            elif sort_by == "semver":
-                key.extend(exploded_semver[i])
-        sort_mapping[id(remote)] = key
+    def __contains__(self, docname):
+        """True if docname is in the version."""
+        position = self.table.index.get(docname)
+        if position is None:
+            return False
+        return bool(self.bitmap[position >> 3] & (1 << (position & 7)))
 
-    # Sort.
-    remotes.sort(key=lambda k: sort_mapping.get(id(k)))
+    def __iter__(self):
+        """Yield docnames in sorted order."""
+        bitmap = self.bitmap
+        for position, name in enumerate(self.table.names):
+            if bitmap[position >> 3] & (1 << (position & 7)):
+                yield name
+
+    def __len__(self):
+        """Number of documents in the version."""
+        return self._len
+
+    def __repr__(self):
+        """Show docnames, deterministic for the build cache key and Sphinx's config hash."""
+        return "FoundDocs({!r})".format(tuple(self))
+
+    def __reduce__(self):
+        """Pickle the table by reference so it's only stored once with all versions."""
+        return FoundDocs, (self.table, self.bitmap)
 
 
 class Versions(object):
@@ -96,6 +205,7 @@ class Versions(object):
 
     :ivar iter remotes: List of dicts for every branch/tag.
     :ivar dict context: Current Jinja2 context, provided by Sphinx's html-page-context API hook.
+    :ivar PageTable page_table: Document names of all versions after pack_found_docs().
     :ivar dict greatest_tag_remote: Tag with the highest version number if it's a valid semver.
     :ivar dict recent_branch_remote: Most recently committed branch.
     :ivar dict recent_remote: Most recently committed branch/tag.
@@ -110,6 +220,9 @@ class Versions(object):
         :param str priority: May be "branches" or "tags". Groups either before the other. Maintains order otherwise.
         :param bool invert: Invert sorted/grouped remotes at the end of processing.
         """
+        self._doc_sets = dict()
+        self._indexes = (None, None, None)
+        self._links = (None, None, None)
         self.remotes = [
             dict(
                 id="/".join(r[2:0:-1]),  # str; kind/name
@@ -126,6 +239,7 @@ class Versions(object):
             for r in remotes
         ]
         self.context = dict()
+        self.page_table = PageTable(())
         self.greatest_tag_remote = None
         self.recent_branch_remote = None
         self.recent_remote = None
@@ -147,21 +261,61 @@ class Versions(object):
 
         # Get significant remotes.
         if self.remotes:
-            remotes = self.remotes[:]
-            multi_sort(remotes, ("time",))
-            self.recent_remote = remotes[0]
-            self.recent_branch_remote = (
-                [r for r in remotes if r["kind"] != "tags"] or [None]
-            )[0]
-            self.recent_tag_remote = (
-                [r for r in remotes if r["kind"] == "tags"] or [None]
-            )[0]
-            if self.recent_tag_remote:
-                multi_sort(remotes, ("semver",))
-                greatest_tag_remote = [r for r in remotes if r["kind"] == "tags"][0]
-                if RE_SEMVER.search(greatest_tag_remote["name"]):
+            by_time = SORT_KEYS["time"]
+            tags = [r for r in self.remotes if r["kind"] == "tags"]
+            self.recent_remote = min(self.remotes, key=by_time)
+            self.recent_branch_remote = min(
+                (r for r in self.remotes if r["kind"] != "tags"),
+                key=by_time,
+                default=None,
+            )
+            self.recent_tag_remote = min(tags, key=by_time, default=None)
+            if tags:
+                greatest_tag_remote = min(
+                    tags, key=lambda r: (_remote_semver(r), by_time(r))
+                )
+                if greatest_tag_remote["semver"][0] == 0:
                     self.greatest_tag_remote = greatest_tag_remote
 
+    def __getstate__(self):
+        """Pickle without lookup caches, they're rebuilt when needed. Keeps pickles of equal instances identical."""
+        state = self.__dict__.copy()
+        state.update(
+            _doc_sets=dict(), _indexes=(None, None, None), _links=(None, None, None)
+        )
+        return state
+
+    @property
+    def remotes(self):
+        """List of dicts for every branch/tag."""
+        return self._remotes
+
+    @remotes.setter
+    def remotes(self, remotes):
+        """Replace all remotes.
+
+        :param iter remotes: List of dicts.
+        """
+        self._remotes = Remotes(remotes)
+
+    def _lookup_indexes(self):
+        """Get indexes for __getitem__(), rebuilt only after self.remotes changes.
+
+        :return: Dicts mapping each of id, sha, name and date to the first remote with that value, and a sorted list of
+            (sha, position in self.remotes) tuples for abbreviated SHAs.
+        :rtype: tuple
+        """
+        remotes = self._remotes
+        if self._indexes[0] is remotes and self._indexes[1] == remotes.changes:
+            return self._indexes[2]
+        by_key = {k: dict() for k in ("id", "sha", "name", "date")}
+        for remote in remotes:
+            for key, index in by_key.items():
+                index.setdefault(remote[key], remote)
+        shas = sorted((r["sha"], i) for i, r in enumerate(remotes))
+        self._indexes = (remotes, remotes.changes, (by_key, shas))
+        return self._indexes[2]
+
     def __bool__(self):
         """True if self.remotes is not empty. Python 3.x."""
         return bool(self.remotes)
@@ -175,18 +329,27 @@ class Versions(object):
         return len(self.remotes)
 
     def __getitem__(self, item):
-        """Retrieve a version dict from self.remotes by any of its attributes."""
+        """Retrieve a version dict from self.remotes by any of its attributes.
+
+        Uses hash indexes instead of scanning self.remotes since this is called for every version link on every page.
+        """
+        by_key, shas = self._lookup_indexes()
         # First assume item is an attribute.
         for key in ("id", "sha", "name", "date"):
-            for remote in self.remotes:
-                if remote[key] == item:
-                    return remote
-        # Next assume item is a substring of a sha.
+            try:
+                return by_key[key][item]
+            except (KeyError, TypeError):  # TypeError if unhashable (e.g. slice).
+                pass
+        # Next assume item is a substring of a sha, usually an abbreviated sha.
         try:
             length = len(item)
         except TypeError:  # Not an int.
             length = 0
-        if length >= 5:
+        if length >= 5 and isinstance(item, str):
+            start = bisect.bisect_left(shas, (item,))
+            end = bisect.bisect_left(shas, (item + "\uffff",), start)
+            if start < end:
+                return self.remotes[min(i for _, i in shas[start:end])]
             for remote in self.remotes:
                 if item in remote["sha"]:
                     return remote
@@ -198,29 +361,108 @@ class Versions(object):
         # Nothing found, IndexError not raised. item was probably a string, raising KeyError.
         raise KeyError(item)
 
-    def __iter__(self):
-        """Yield name and urls of branches and tags."""
+    def pack_found_docs(self):
+        """Replace found_docs of every remote with a FoundDocs sharing one PageTable, stored in self.page_table."""
+        names = set()
+        for remote in self.remotes:
+            names.update(remote["found_docs"])
+        self.page_table = PageTable(sorted(names))
         for remote in self.remotes:
+            remote["found_docs"] = self.page_table.found_docs(remote["found_docs"])
+        self._doc_sets.clear()
+
+    def _found_docs(self, remote):
+        """Get a set of a remote's found_docs for constant time membership tests, converted once per remote.
+
+        :param dict remote: From self.remotes.
+
+        :return: Document names in the remote.
+        :rtype: frozenset or FoundDocs
+        """
+        found_docs = remote["found_docs"]
+        if isinstance(found_docs, (frozenset, FoundDocs)):
+            return found_docs
+        cached = self._doc_sets.get(remote["id"])
+        if cached is None or cached[0] is not found_docs:
+            cached = (found_docs, frozenset(found_docs))
+            self._doc_sets[remote["id"]] = cached
+        return cached[1]
+
+    def _link_table(self, exists=None):
+        """Get links to the current document in every version, computed once per page instead of once per call.
+
+        Rebuilt when the current version/page changes or self.remotes changes. URLs are the same as vpathto() returns.
+
+        :param iter exists: Rebuild using these flags (one per remote) for which versions have the current document.
+
+        :return: List of (name, url, exists, kind) tuples in self.remotes order, and a dict of those tuples keyed by
+            version names that resolve to the same remote through __getitem__().
+        :rtype: tuple
+        """
+        remotes = self._remotes
+        current_version = self.context["current_version"]
+        pagename = self.context["pagename"]
+        is_root = self.context["scv_is_root"]
+        key = (remotes.changes, current_version, pagename, is_root)
+        if exists is None and self._links[0] is remotes and self._links[1] == key:
+            return self._links[2]
+
+        by_key = self._lookup_indexes()[0]
+        prefix = "../" * pagename.count("/") + ("" if is_root else "../")
+        table, by_name = list(), dict()
+        for remote, flag in zip(remotes, exists or [None] * len(remotes)):
             name = remote["name"]
-            yield name, self.vpathto(name)
+            if name == current_version:
+                flag = True
+            elif flag is None:
+                flag = pagename in self._found_docs(remote)
+            if name == current_version and not is_root:
+                url = "{}.html".format(pagename.split("/")[-1])
+            else:
+                url = "{}{}/{}.html".format(
+                    prefix,
+                    remote["root_dir"],
+                    pagename if flag else remote["master_doc"],
+                )
+            link = (name, url, flag, remote["kind"])
+            table.append(link)
+            if (
+                name not in by_key["id"]
+                and name not in by_key["sha"]
+                and by_key["name"][name] is remote
+            ):
+                by_name[name] = link
+        self._links = (remotes, key, (table, by_name))
+        return self._links[2]
+
+    def prime_links(self, exists):
+        """Precompute links for the current context with known flags instead of the current document's name.
+
+        Used to render templates with a placeholder page name that isn't in any version's found_docs.
+
+        :param iter exists: Whether each version (in self.remotes order) has the document. E.g. from self.links.
+        """
+        self._link_table(tuple(exists))
+
+    @property
+    def links(self):
+        """Return list of (name, url, exists) for all versions. Precomputed once per page for templates."""
+        return [link[:3] for link in self._link_table()[0]]
+
+    def __iter__(self):
+        """Yield name and urls of branches and tags."""
+        for name, url, _, _ in self._link_table()[0]:
+            yield name, url
 
     @property
     def branches(self):
         """Return list of (name and urls) only branches."""
-        return [
-            (r["name"], self.vpathto(r["name"]))
-            for r in self.remotes
-            if r["kind"] == "heads"
-        ]
+        return [(n, u) for n, u, _, k in self._link_table()[0] if k == "heads"]
 
     @property
     def tags(self):
         """Return list of (name and urls) only tags."""
-        return [
-            (r["name"], self.vpathto(r["name"]))
-            for r in self.remotes
-            if r["kind"] == "tags"
-        ]
+        return [(n, u) for n, u, _, k in self._link_table()[0] if k == "tags"]
 
     def vhasdoc(self, other_version):
         """Return True if the other version has the current document. Like Sphinx's hasdoc().
@@ -234,7 +476,10 @@ class Versions(object):
         """
         if self.context["current_version"] == other_version:
             return True
-        return self.context["pagename"] in self[other_version]["found_docs"]
+        link = self._link_table()[1].get(other_version)
+        if link is not None:
+            return link[2]
+        return self.context["pagename"] in self._found_docs(self[other_version])
 
     def vpathto(self, other_version):
         """Return relative path to current document in another version. Like Sphinx's pathto().
@@ -252,6 +497,9 @@ class Versions(object):
         pagename = self.context["pagename"]
         if self.context["current_version"] == other_version and not is_root:
             return "{}.html".format(pagename.split("/")[-1])
+        link = self._link_table()[1].get(other_version)
+        if link is not None:
+            return link[1]
 
         other_remote = self[other_version]
         other_root_dir = other_remote["root_dir"]
@@ -260,4 +508,4 @@ class Versions(object):
         components += [
             pagename if self.vhasdoc(other_version) else other_remote["master_doc"]
         ]
-        return "{}.html".format(__import__("posixpath").join(*components))
+        return "{}.html".format(posixpath.join(*components))
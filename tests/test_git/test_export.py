@@ -1,5 +1,6 @@
 """Test function in module."""
 
+import subprocess
 import time
 from datetime import datetime
 from os.path import join
@@ -7,7 +8,13 @@ from subprocess import CalledProcessError
 
 import pytest
 
-from sphinxcontrib_versioning.git import export, fetch_commits, IS_WINDOWS, list_remote
+from sphinxcontrib_versioning.git import (
+    export,
+    export_linked,
+    fetch_commits,
+    IS_WINDOWS,
+    list_remote,
+)
 
 
 def test_simple(tmpdir, local):
@@ -174,3 +181,149 @@ def test_timezones(tmpdir, local):
             "Need to add expected for {} timezone.".format(-time.timezone)
         )
     assert actual == expected
+
+
+def test_last_modified(monkeypatch, tmpdir, local):
+    """Test mtime of RST files changed in different commits is set with a single "git log" walk.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    for i, name in enumerate(("one.rst", "sub/two.RST", "one.rst", "three.rst")):
+        local.ensure(name).write(str(i))
+        pytest.run(local, ["git", "add", name])
+        env = {"GIT_AUTHOR_DATE": "{} +0000".format(1480900000 + i * 60)}
+        pytest.run(local, ["git", "commit", "-m", "Changed " + name], environ=env)
+    sha = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+
+    commands = list()
+    monkeypatch.setattr(
+        "sphinxcontrib_versioning.git.Popen",
+        lambda cmd, **kw: commands.append(cmd) or subprocess.Popen(cmd, **kw),
+    )
+    target = tmpdir.ensure_dir("target")
+    export(str(local), sha, str(target))
+
+    assert [c[1] for c in commands] == ["archive", "log"]
+    assert target.join("one.rst").mtime() == 1480900120
+    assert target.join("sub", "two.RST").mtime() == 1480900060
+    assert target.join("three.rst").mtime() == 1480900180
+
+
+@pytest.mark.skipif(str(IS_WINDOWS))
+def test_linked(tmpdir, local):
+    """Test exporting from the blob store. Unchanged files are shared between commits.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    local.ensure("docs", "index.rst").write("Index")
+    local.ensure("docs", "run.sh").write("#!/bin/sh")
+    local.join("docs", "run.sh").chmod(0o755)
+    local.join("link").mksymlinkto("README")
+    pytest.run(local, ["git", "add", "docs", "link"])
+    env = {"GIT_AUTHOR_DATE": "1480900000 +0000"}
+    pytest.run(local, ["git", "commit", "-m", "Added docs."], environ=env)
+    sha1 = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+    local.join("docs", "other.rst").write("Other")
+    pytest.run(local, ["git", "add", "docs"])
+    pytest.run(local, ["git", "commit", "-m", "Added other."])
+    sha2 = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+
+    store = tmpdir.join("blobs")
+    export_linked(str(local), sha1, str(tmpdir.join("one")), str(store))
+    export_linked(str(local), sha2, str(tmpdir.join("two")), str(store))
+    one, two = tmpdir.join("one"), tmpdir.join("two")
+
+    files = sorted(f.relto(two) for f in two.visit())
+    assert files == sorted(
+        [
+            "README",
+            "docs",
+            join("docs", "index.rst"),
+            join("docs", "other.rst"),
+            join("docs", "run.sh"),
+            "link",
+        ]
+    )
+    assert two.join("docs", "other.rst").read() == "Other"
+    assert two.join("link").readlink() == "README"
+    assert two.join("docs", "run.sh").stat().mode & 0o777 == 0o555
+    assert two.join("README").stat().mode & 0o777 == 0o444
+    assert one.join("docs", "index.rst").mtime() == 1480900000
+
+    # Same blob, same inode.
+    assert one.join("README").stat().ino == two.join("README").stat().ino
+    assert (
+        one.join("docs", "index.rst").stat().ino
+        == two.join("docs", "index.rst").stat().ino
+    )
+    assert len([f for f in store.listdir() if "-" not in f.basename]) == 5
+
+
+def test_linked_copy_paths(tmpdir, local):
+    """Test that files copied instead of linked can be written to without changing the store or other exports.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    local.ensure("docs", "index.rst").write("Index")
+    local.ensure("docs", "run.sh").write("#!/bin/sh")
+    local.join("docs", "run.sh").chmod(0o755)
+    pytest.run(local, ["git", "add", "docs"])
+    env = {"GIT_AUTHOR_DATE": "1480900000 +0000"}
+    pytest.run(local, ["git", "commit", "-m", "Added docs."], environ=env)
+    sha = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+
+    store = tmpdir.join("blobs")
+    export_linked(
+        str(local), sha, str(tmpdir.join("one")), str(store), None, ["docs"]
+    )
+    export_linked(str(local), sha, str(tmpdir.join("two")), str(store))
+    one, two = tmpdir.join("one"), tmpdir.join("two")
+
+    # Copied like export() would write them.
+    assert (
+        one.join("docs", "index.rst").stat().ino
+        != two.join("docs", "index.rst").stat().ino
+    )
+    assert one.join("docs", "index.rst").stat().mode & 0o777 == 0o644
+    assert one.join("docs", "run.sh").stat().mode & 0o777 == 0o755
+    assert one.join("docs", "index.rst").mtime() == 1480900000
+    assert one.join("README").stat().ino == two.join("README").stat().ino
+
+    # Written in place like autosummary does.
+    with open(str(one.join("docs", "index.rst")), "w") as handle:
+        handle.write("Changed")
+    assert two.join("docs", "index.rst").read() == "Index"
+    assert "Changed" not in [f.read() for f in store.listdir()]
+    export_linked(str(local), sha, str(tmpdir.join("three")), str(store), None, [""])
+    assert tmpdir.join("three", "docs", "index.rst").read() == "Index"
+    assert tmpdir.join("three", "README").stat().ino != two.join("README").stat().ino
+
+
+@pytest.mark.parametrize("linked", [False, True])
+def test_paths(tmpdir, local, linked):
+    """Test exporting only some directories. Paths missing from the commit are ignored.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    :param bool linked: Use export_linked() instead of export().
+    """
+    local.ensure("docs", "conf.py").write("")
+    local.ensure("pkg", "mod.py").write("")
+    local.ensure("tests", "big.bin").write("0" * 1024)
+    pytest.run(local, ["git", "add", "docs", "pkg", "tests"])
+    pytest.run(local, ["git", "commit", "-m", "Added dirs."])
+    sha = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+
+    target = tmpdir.ensure_dir("target")
+    paths = ["docs", "pkg", "missing"]
+    if linked:
+        export_linked(str(local), sha, str(target), str(tmpdir.join("blobs")), paths)
+    else:
+        export(str(local), sha, str(target), paths)
+
+    files = sorted(f.relto(target) for f in target.visit())
+    assert files == ["docs", join("docs", "conf.py"), "pkg", join("pkg", "mod.py")]
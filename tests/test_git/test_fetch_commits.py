@@ -7,6 +7,7 @@ from sphinxcontrib_versioning.git import (
     filter_and_date,
     GitError,
     list_remote,
+    missing_commits,
 )
 
 
@@ -79,3 +80,40 @@ def test_new_branch_tags(local, local_light, clone_branch):
     dates = filter_and_date(str(local), ["README"], shas)
     assert len(dates) == 3
     pytest.run(local, ["git", "diff-index", "--quiet", "HEAD", "--"])
+
+
+@pytest.mark.usefixtures("outdate_local")
+def test_missing_commits(local):
+    """Find commits not fetched yet with one batch query.
+
+    :param local: conftest fixture.
+    """
+    remotes = list_remote(str(local))
+    shas = [r[0] for r in remotes]
+    missing = missing_commits(str(local), shas + shas)
+    assert missing
+    assert len(missing) == len(set(missing))
+    assert set(missing) < set(shas)
+
+    fetch_commits(str(local), remotes)
+    assert missing_commits(str(local), shas) == []
+    assert missing_commits(str(local), []) == []
+
+
+@pytest.mark.usefixtures("outdate_local")
+def test_blob_filter(local, remote):
+    """Fetch missing commits without file contents.
+
+    :param local: conftest fixture.
+    :param remote: conftest fixture.
+    """
+    pytest.run(remote, ["git", "config", "uploadpack.allowFilter", "true"])
+    remotes = list_remote(str(local))
+    shas = {r[0] for r in remotes}
+
+    fetch_commits(str(local), remotes, blob_filter="blob:none")
+    dates = filter_and_date(str(local), ["README"], shas)  # Fetches blobs on demand.
+    assert len(dates) == 3
+    config = pytest.run(local, ["git", "config", "--get-regexp", r"^remote\.origin\."])
+    assert "remote.origin.promisor true" in config
+    assert "remote.origin.partialclonefilter blob:none" in config
@@ -0,0 +1,75 @@
+"""Test function in module."""
+
+import subprocess
+
+import pytest
+
+from sphinxcontrib_versioning.git import fetch_missing, is_partial_clone
+
+
+def test_regular_clone(monkeypatch, local):
+    """Nothing can be missing without a promisor remote.
+
+    :param monkeypatch: pytest fixture.
+    :param local: conftest fixture.
+    """
+    sha = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+    assert not is_partial_clone(str(local))
+
+    commands = list()
+    original = subprocess.Popen
+    monkeypatch.setattr(
+        "sphinxcontrib_versioning.git.Popen",
+        lambda command, **kw: commands.append(command) or original(command, **kw),
+    )
+    fetch_missing(str(local), [sha], ["docs"])
+    assert not commands
+
+
+@pytest.mark.parametrize("blob_filter", ["blob:none", "tree:0"])
+def test_partial_clone(monkeypatch, tmpdir, local, remote, blob_filter):
+    """Fetch only objects below the given paths, in one git fetch.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    :param remote: conftest fixture.
+    :param str blob_filter: Clone with this --filter.
+    """
+    local.ensure("docs", "conf.py").write("project = 'test'\n")
+    local.ensure("docs", "sub", "index.rst").write("Test\n====\n")
+    local.ensure("src", "module.py").write("pass\n")
+    pytest.run(local, ["git", "add", "docs", "src"])
+    pytest.run(local, ["git", "commit", "-m", "Add docs and code."])
+    pytest.run(local, ["git", "push", "origin", "main"])
+    sha = pytest.run(local, ["git", "rev-parse", "HEAD"]).strip()
+    blobs = dict(
+        reversed(line.split()[2:])
+        for line in pytest.run(local, ["git", "ls-tree", "-r", sha]).splitlines()
+    )
+
+    pytest.run(remote, ["git", "config", "uploadpack.allowFilter", "true"])
+    pytest.run(remote, ["git", "config", "uploadpack.allowAnySHA1InWant", "true"])
+    partial = tmpdir.ensure_dir("partial")
+    pytest.run(
+        partial,
+        ["git", "clone", "--no-checkout", "--filter=" + blob_filter]
+        + ["file://{}".format(remote), "."],
+    )
+    assert is_partial_clone(str(partial))
+
+    commands = list()
+    original = subprocess.Popen
+    monkeypatch.setattr(
+        "sphinxcontrib_versioning.git.Popen",
+        lambda command, **kw: commands.append(command) or original(command, **kw),
+    )
+    fetch_missing(str(partial), [sha, "0" * 40], ["docs"])  # Unfetched SHA ignored.
+    fetches = [c for c in commands if "fetch" in c]
+    assert len(fetches) == (1 if blob_filter == "blob:none" else 2)
+
+    output = pytest.run(partial, ["git", "rev-list", "--objects", "--missing=print", sha])
+    missing = {line[1:] for line in output.splitlines() if line.startswith("?")}
+    assert blobs["docs/conf.py"] not in missing
+    assert blobs["docs/sub/index.rst"] not in missing
+    assert blobs["src/module.py"] in missing
@@ -1,10 +1,16 @@
 """Test function in module."""
 
+import subprocess
 import time
 
 import pytest
 
-from sphinxcontrib_versioning.git import filter_and_date, GitError, list_remote
+from sphinxcontrib_versioning.git import (
+    filter_and_date,
+    GitError,
+    is_partial_clone,
+    list_remote,
+)
 
 
 def test_one_commit(local):
@@ -104,3 +110,29 @@ def test_outdated_local(tmpdir, local, remote):
     assert (
         len(dates) == 3
     )  # Original SHA is the same for everything. Plus above two commits.
+
+
+def test_process_count(monkeypatch, local):
+    """Test that the number of git processes doesn't grow with the number of commits.
+
+    :param monkeypatch: pytest fixture.
+    :param local: conftest fixture.
+    """
+    shas = list()
+    for i in range(60):
+        local.ensure("docs", "conf.py").write("pass\n" * i)
+        pytest.run(local, ["git", "add", "docs/conf.py"])
+        pytest.run(local, ["git", "commit", "-m", "add"])
+        shas.append(pytest.run(local, ["git", "rev-parse", "HEAD"]).strip())
+
+    is_partial_clone(str(local))  # Cached, checked once per repository.
+    commands = list()
+    original = subprocess.Popen
+    monkeypatch.setattr(
+        "sphinxcontrib_versioning.git.Popen",
+        lambda command, **kw: commands.append(command) or original(command, **kw),
+    )
+    dates = filter_and_date(str(local), ["conf.py", "docs/conf.py"], shas)
+    assert len(commands) == 2
+    assert list(dates) == shas
+    assert all(v[1] == "docs/conf.py" for v in dates.values())
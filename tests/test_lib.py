@@ -1,8 +1,10 @@
 """Test objects in module."""
 
+import time
+
 import pytest
 
-from sphinxcontrib_versioning.lib import Config
+from sphinxcontrib_versioning.lib import Config, Timings, WorkerPool
 
 
 def test_config():
@@ -82,3 +84,65 @@ def test_config():
         exc.value.args[0]
         == "'Config' object does not support item re-assignment on 'invert'"
     )
+
+
+def test_timings():
+    """Test Timings class."""
+    timings = Timings()
+    with timings.measure("phase"):
+        with timings.measure("step", "ref"):
+            sum(range(100000))
+    with pytest.raises(ValueError):
+        with timings.measure("failing", "ref"):
+            raise ValueError
+    assert [(r["step"], r["ref"]) for r in timings.records] == [
+        ("step", "ref"),
+        ("phase", None),
+        ("failing", "ref"),
+    ]
+    step, phase = timings.records[:2]
+    assert 0 <= step["wall"] <= phase["wall"]
+    assert 0 <= step["cpu"] <= phase["cpu"]
+    assert phase["started"] <= step["started"]
+    assert phase["peak_rss"] > 0
+
+    timings.reset()
+    assert timings.records == []
+
+
+def _burn(seconds):
+    """Use CPU time in a WorkerPool job.
+
+    :param float seconds: How long.
+
+    :return: Seconds of CPU time used.
+    :rtype: float
+    """
+    start = time.process_time()
+    while time.process_time() - start < seconds:
+        pass
+    return time.process_time() - start
+
+
+def test_timings_worker_pool():
+    """Test that CPU time of WorkerPool jobs is measured when they finish, not when their worker exits."""
+    timings = Timings()
+    pool = WorkerPool(3)
+    try:
+        before = WorkerPool.cpu  # Other tests' pools may still have workers.
+        for _ in range(2):  # Same worker both times.
+            with timings.measure("step", "ref"):
+                job = pool.submit(_burn, (0.2,))
+                job.join()
+            assert job.exitcode == 0
+        # os.times() counts in clock ticks, allow for rounding.
+        assert [r["cpu"] >= 0.15 for r in timings.records] == [True, True]
+        assert WorkerPool.cpu - before >= 0.3
+
+        # Once the worker is reaped its CPU time is in os.times() instead.
+        with timings.measure("close"):
+            pool.close()
+        assert abs(WorkerPool.cpu - before) < 0.001
+        assert timings.records[-1]["cpu"] < 0.15
+    finally:
+        pool.close()
@@ -1,5 +1,8 @@
 """Test function in module."""
 
+import json
+import logging
+import multiprocessing.connection
 import re
 from os.path import join
 
@@ -8,6 +11,7 @@ import pytest
 from sphinxcontrib_versioning.git import export
 from sphinxcontrib_versioning.lib import HandledError
 from sphinxcontrib_versioning.routines import build_all, gather_git_info
+from sphinxcontrib_versioning.sphinx_ import store_versions
 from sphinxcontrib_versioning.versions import Versions
 
 RE_LAST_UPDATED = re.compile(r"Last updated[^\n]+\n")
@@ -557,3 +561,364 @@ def test_all_errors(tmpdir, local_docs, urls):
         destination.join("main", "contents.html"),
         ['<li><a href="contents.html">main</a></li>'],
     )
+
+
+def test_jobs(monkeypatch, tmpdir, caplog, config, local_docs, urls):
+    """Test building refs concurrently with --jobs, including skipping bad non-root refs.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    config.jobs = 3
+    config.root_ref = "main"
+    pytest.run(local_docs, ["git", "checkout", "-b", "a_good", "main"])
+    pytest.run(local_docs, ["git", "checkout", "-b", "c_good", "main"])
+    pytest.run(local_docs, ["git", "checkout", "-b", "b_broken", "main"])
+    local_docs.join("conf.py").write("master_doc = exception\n")
+    pytest.run(local_docs, ["git", "commit", "-am", "Broken version."])
+    pytest.run(local_docs, ["git", "push", "origin", "a_good", "b_broken", "c_good"])
+
+    versions = Versions(
+        gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()), sort=["alpha"]
+    )
+    exported_root = tmpdir.ensure_dir("exported_root")
+    for name in ("main", "b_broken"):
+        export(
+            str(local_docs),
+            versions[name]["sha"],
+            str(exported_root.join(versions[name]["sha"])),
+        )
+
+    # Run.
+    destination = tmpdir.ensure_dir("destination")
+    stored = list()
+    monkeypatch.setattr(
+        "sphinxcontrib_versioning.routines.store_versions",
+        lambda v: stored.append(v) or store_versions(v),
+    )
+    build_all(str(exported_root), str(destination), versions)
+    assert [r["name"] for r in versions.remotes] == ["a_good", "c_good", "main"]
+    assert len(stored) == 3  # Once per pass and once more when b_broken failed.
+
+    # Verify output is in the same order as a serial build.
+    messages = [r.message for r in caplog.records if r.message.startswith("Building ")]
+    assert messages[:5] == [
+        "Building root: main",
+        "Building ref: a_good",
+        "Building ref: b_broken",
+        "Building ref: c_good",
+        "Building ref: main",
+    ]
+
+    # Only builds started before b_broken failed are repeated.
+    assert messages[5:7] == ["Building root: main", "Building ref: a_good"]
+    assert messages[7:] in (
+        [],
+        ["Building ref: c_good"],
+        ["Building ref: c_good", "Building ref: main"],
+    )
+
+    # Verify HTML links.
+    urls(
+        destination.join("contents.html"),
+        [
+            '<a href="a_good/contents.html">a_good</a>',
+            '<a href="c_good/contents.html">c_good</a>',
+            '<a href="main/contents.html">main</a>',
+        ],
+    )
+    urls(
+        destination.join("c_good", "contents.html"),
+        [
+            '<a href="../a_good/contents.html">a_good</a>',
+            '<a href="contents.html">c_good</a>',
+            '<a href="../main/contents.html">main</a>',
+        ],
+    )
+
+
+def test_refresh(monkeypatch, capfd, tmpdir, caplog, config, local_docs):
+    """Test that only versions built before a failed ref are built again, without reading their documents again.
+
+    :param monkeypatch: pytest fixture.
+    :param capfd: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    config.root_ref = "main"
+    local_docs.join("conf.py").write('master_doc = "contents"\n')
+    pytest.run(local_docs, ["git", "commit", "-am", "Set master_doc."])
+    pytest.run(local_docs, ["git", "checkout", "-b", "a_good", "main"])
+    pytest.run(local_docs, ["git", "checkout", "-b", "c_good", "main"])
+    pytest.run(local_docs, ["git", "checkout", "-b", "b_broken", "main"])
+    local_docs.join("conf.py").write("master_doc = exception\n")
+    pytest.run(local_docs, ["git", "commit", "-am", "Broken version."])
+    pytest.run(
+        local_docs, ["git", "push", "origin", "main", "a_good", "b_broken", "c_good"]
+    )
+
+    versions = Versions(
+        gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()), sort=["alpha"]
+    )
+    exported_root = tmpdir.ensure_dir("exported_root")
+    for name in ("main", "b_broken"):
+        export(
+            str(local_docs),
+            versions[name]["sha"],
+            str(exported_root.join(versions[name]["sha"])),
+        )
+
+    # Run.
+    destination = tmpdir.ensure_dir("destination")
+    stored = list()
+    monkeypatch.setattr(
+        "sphinxcontrib_versioning.routines.store_versions",
+        lambda v: stored.append(v) or store_versions(v),
+    )
+    build_all(str(exported_root), str(destination), versions)
+    assert [r["name"] for r in versions.remotes] == ["a_good", "c_good", "main"]
+    assert len(stored) == 3  # Once per pass and once more when b_broken failed.
+    messages = [r.message for r in caplog.records if r.message.startswith("Building ")]
+    assert messages == [
+        "Building root: main",
+        "Building ref: a_good",
+        "Building ref: b_broken",
+        "Building ref: c_good",
+        "Building ref: main",
+        "Building root: main",
+        "Building ref: a_good",
+    ]
+
+    # Repeated builds only run the write phase.
+    stdout = capfd.readouterr()[0]
+    assert stdout.count("0 added, 0 changed, 0 removed") == 2
+    assert "b_broken" not in destination.join("a_good", "contents.html").read()
+    assert "b_broken" not in destination.join("contents.html").read()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_cache(tmpdir, caplog, config, local_docs, jobs):
+    """Test reusing unchanged sphinx-build output from --cache-dir.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param int jobs: Number of concurrent sphinx-build processes.
+    """
+    caplog.set_level(logging.INFO)
+    config.cache_dir = str(tmpdir.join("cache"))
+    config.jobs = jobs
+    config.root_ref = "main"
+    pytest.run(local_docs, ["git", "tag", "v1.0.0"])
+    pytest.run(local_docs, ["git", "push", "origin", "v1.0.0"])
+
+    versions = Versions(gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()))
+    exported_root = tmpdir.ensure_dir("exported_root")
+    export(
+        str(local_docs),
+        versions["main"]["sha"],
+        str(exported_root.join(versions["main"]["sha"])),
+    )
+
+    # First run populates the cache.
+    destination = tmpdir.ensure_dir("destination")
+    build_all(str(exported_root), str(destination), versions)
+    assert len(tmpdir.join("cache", "builds").listdir()) == 3
+    assert not [r for r in caplog.records if "cached" in r.getMessage()]
+    expected = destination.join("v1.0.0", "contents.html").read()
+
+    # Second run into an empty destination copies everything from the cache. Worker reuse doesn't change the output.
+    caplog.clear()
+    config.max_worker_jobs = 2
+    destination = tmpdir.ensure_dir("destination2")
+    build_all(str(exported_root), str(destination), versions)
+    assert len(tmpdir.join("cache", "builds").listdir()) == 3
+    assert destination.join("v1.0.0", "contents.html").read() == expected
+    assert destination.join("main", ".doctrees").check(dir=True)
+    if jobs == 1:
+        messages = [r.message for r in caplog.records if "cached" in r.message]
+        assert messages == ["Nothing changed, using cached build of: main"] * 2 + [
+            "Nothing changed, using cached build of: v1.0.0"
+        ]
+
+    # Changing settings invalidates the cache.
+    config.overflow = ("-D", "copyright=2016, SCV")
+    build_all(str(exported_root), str(destination), versions)
+    assert len(tmpdir.join("cache", "builds").listdir()) == 6
+    assert "2016, SCV" in destination.join("v1.0.0", "contents.html").read()
+
+
+def test_cache_other_commit(tmpdir, caplog, config, local_docs):
+    """Test that a commit on one branch doesn't invalidate cached builds of the other versions.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    config.cache_dir = str(tmpdir.join("cache"))
+    config.root_ref = "main"
+    pytest.run(local_docs, ["git", "tag", "v1.0.0"])
+    pytest.run(local_docs, ["git", "push", "origin", "v1.0.0"])
+    exported_root = tmpdir.ensure_dir("exported_root")
+
+    def run(destination):
+        """Gather, export and build all versions.
+
+        :param str destination: Destination directory name.
+        """
+        versions = Versions(
+            gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple())
+        )
+        for remote in versions.remotes:
+            if not exported_root.join(remote["sha"]).check():
+                export(
+                    str(local_docs),
+                    remote["sha"],
+                    str(exported_root.join(remote["sha"])),
+                )
+        build_all(str(exported_root), str(tmpdir.ensure_dir(destination)), versions)
+
+    run("destination")
+
+    # Commit on main that doesn't add or remove documents.
+    local_docs.join("one.rst").write("Changed\n=======\n")
+    pytest.run(local_docs, ["git", "commit", "-am", "Change one."])
+    pytest.run(local_docs, ["git", "push", "origin", "main"])
+    caplog.clear()
+    run("destination2")
+
+    messages = [r.message for r in caplog.records if "cached" in r.message]
+    assert messages == ["Nothing changed, using cached build of: v1.0.0"]
+    assert "Changed" in tmpdir.join("destination2", "main", "one.html").read()
+
+
+def test_cache_hits_parallel(monkeypatch, tmpdir, config, local_docs):
+    """Test that cache hits don't leave --jobs slots empty until the next build finishes.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.cache_dir = str(tmpdir.join("cache"))
+    config.jobs = 2
+    config.root_ref = "main"
+    pytest.run(local_docs, ["git", "checkout", "-b", "a_stable"])
+    pytest.run(local_docs, ["git", "push", "origin", "a_stable"])
+    pytest.run(local_docs, ["git", "checkout", "main"])
+    exported_root = tmpdir.ensure_dir("exported_root")
+
+    def run(destination):
+        """Gather, export and build all versions.
+
+        :param str destination: Destination directory name.
+        """
+        versions = Versions(
+            gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple())
+        )
+        for remote in versions.remotes:
+            if not exported_root.join(remote["sha"]).check():
+                export(
+                    str(local_docs),
+                    remote["sha"],
+                    str(exported_root.join(remote["sha"])),
+                )
+        build_all(str(exported_root), str(tmpdir.ensure_dir(destination)), versions)
+
+    run("destination")
+
+    # Root (main) and main are rebuilt, a_stable in between them is a cache hit.
+    local_docs.join("one.rst").write("Changed\n=======\n")
+    pytest.run(local_docs, ["git", "commit", "-am", "Change one."])
+    pytest.run(local_docs, ["git", "push", "origin", "main"])
+    waited = list()
+    original = multiprocessing.connection.wait
+    monkeypatch.setattr(
+        "multiprocessing.connection.wait",
+        lambda sentinels: waited.append(len(sentinels)) or original(sentinels),
+    )
+    run("destination2")
+    assert waited[0] == 2
+
+
+def test_versions_json(tmpdir, caplog, config, local_docs):
+    """Test listing versions in versions.json instead of in every page, so new tags don't change other versions.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    config.banner_main_ref = "v1.0.0"
+    config.cache_dir = str(tmpdir.join("cache"))
+    config.root_ref = "main"
+    config.show_banner = True
+    config.versions_json = True
+    pytest.run(local_docs, ["git", "tag", "v1.0.0"])
+    pytest.run(local_docs, ["git", "push", "origin", "v1.0.0"])
+
+    versions = Versions(gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()))
+    exported_root = tmpdir.ensure_dir("exported_root")
+    export(
+        str(local_docs),
+        versions["main"]["sha"],
+        str(exported_root.join(versions["main"]["sha"])),
+    )
+    for remote in versions.remotes:
+        remote["found_docs"] = ("contents", "one", "three", "two")
+        remote["master_doc"] = "contents"
+    destination = tmpdir.ensure_dir("destination")
+    build_all(str(exported_root), str(destination), versions)
+
+    manifest = json.loads(destination.join("versions.json").read())
+    assert manifest == dict(
+        banner=dict(main_version="v1.0.0"),
+        pages=["contents", "one", "three", "two"],
+        versions=[
+            dict(
+                found_docs="Dw==",  # 0b1111
+                kind=kind,
+                master_doc="contents",
+                name=name,
+                root_dir=name,
+            )
+            for name, kind in (("main", "heads"), ("v1.0.0", "tags"))
+        ],
+    )
+    contents = destination.join("main", "one.html").read()
+    assert '<meta name="scv-versions-json" content="../versions.json" />' in contents
+    assert '<meta name="scv-pagename" content="one" />' in contents
+    assert "_static/versions.js" in contents
+    assert destination.join("main", "_static", "versions.js").check(file=True)
+    assert 'id="scv-banner" data-project="Python" data-is-branch="true" hidden' in contents
+    assert "v1.0.0" not in contents
+
+    # New tag only builds the new version.
+    pytest.run(local_docs, ["git", "tag", "v1.0.1"])
+    pytest.run(local_docs, ["git", "push", "origin", "v1.0.1"])
+    versions = Versions(gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()))
+    for remote in versions.remotes:
+        remote["found_docs"] = ("contents", "one", "three", "two")
+        remote["master_doc"] = "contents"
+    caplog.clear()
+    build_all(str(exported_root), str(destination), versions)
+    messages = [r.message for r in caplog.records if "cached" in r.message]
+    assert messages == [
+        "Nothing changed, using cached build of: main",
+        "Nothing changed, using cached build of: main",
+        "Nothing changed, using cached build of: v1.0.0",
+    ]
+    manifest = json.loads(destination.join("versions.json").read())
+    assert [v["name"] for v in manifest["versions"]] == ["main", "v1.0.0", "v1.0.1"]
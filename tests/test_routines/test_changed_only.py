@@ -0,0 +1,210 @@
+"""Test building only changed versions with read_state() and write_state()."""
+
+import json
+import logging
+
+import py
+import pytest
+
+from sphinxcontrib_versioning.routines import (
+    build_all,
+    gather_git_info,
+    pre_build,
+    read_state,
+    STATE_FILE,
+    write_state,
+)
+from sphinxcontrib_versioning.versions import Versions
+
+
+def run(local_docs, destination):
+    """Build like the build command does with --changed-only.
+
+    :param local_docs: conftest fixture.
+    :param py.path.local destination: Destination directory.
+
+    :return: Output of read_state() after the build.
+    :rtype: dict
+    """
+    versions = Versions(gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()))
+    unchanged = read_state(str(destination), versions)
+    exported_root = pre_build(str(local_docs), versions, unchanged=unchanged)
+    build_all(exported_root, str(destination), versions, unchanged)
+    write_state(str(destination), versions, unchanged)
+    py.path.local(exported_root).remove()
+    return unchanged
+
+
+@pytest.mark.parametrize("versions_json", [False, True])
+def test_changed_only(tmpdir, caplog, config, local_docs, versions_json):
+    """Test that only new and changed versions are built, and the others only if their versions list changed.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param bool versions_json: Read versions list from versions.json in the browser.
+    """
+    caplog.set_level(logging.INFO)
+    config.root_ref = "main"
+    config.versions_json = versions_json
+    pytest.run(local_docs, ["git", "checkout", "-b", "stable"])
+    pytest.run(local_docs, ["git", "push", "origin", "stable"])
+    destination = tmpdir.ensure_dir("destination")
+
+    # First build.
+    unchanged = run(local_docs, destination)
+    assert not unchanged["refs"]
+    assert not unchanged["root"]
+    state = json.loads(destination.join(STATE_FILE).read())
+    assert sorted(state["refs"]) == ["main", "stable"]
+    assert state["refs"]["main"]["found_docs"] == ["contents", "one", "three", "two"]
+    assert state["root"]["name"] == "main"
+    assert "one.html" in state["root"]["listing"]
+    assert destination.join("_static", "versions.js").check() is versions_json
+
+    # Nothing changed.
+    destination.join("stable", "one.html").write("untouched")
+    destination.join("one.html").write("untouched")
+    caplog.clear()
+    unchanged = run(local_docs, destination)
+    assert sorted(unchanged["refs"]) == ["main", "stable"]
+    assert unchanged["root"]
+    assert destination.join("stable", "one.html").read() == "untouched"
+    assert destination.join("one.html").read() == "untouched"
+    records = [(r.levelname, r.message) for r in caplog.records]
+    assert ("INFO", "Changed or new since the previous build: none") in records
+    assert ("INFO", "Up to date, not building: main stable (root)") in records
+
+    # Changing a document in one version only builds that version.
+    local_docs.join("one.rst").write("One Changed\n===========\n")
+    pytest.run(local_docs, ["git", "commit", "-am", "Changed one."])
+    pytest.run(local_docs, ["git", "push", "origin", "stable"])
+    unchanged = run(local_docs, destination)
+    assert sorted(unchanged["refs"]) == ["main"]
+    assert unchanged["root"]
+    assert "One Changed" in destination.join("stable", "one.html").read()
+    assert destination.join("one.html").read() == "untouched"
+
+    # A new version changes the versions list in every page, unless it's read from versions.json.
+    pytest.run(local_docs, ["git", "checkout", "-b", "other", "main"])
+    pytest.run(local_docs, ["git", "push", "origin", "other"])
+    caplog.clear()
+    unchanged = run(local_docs, destination)
+    records = [(r.levelname, r.message) for r in caplog.records]
+    assert ("INFO", "Changed or new since the previous build: other") in records
+    assert destination.join("other", "one.html").check(file=True)
+    if versions_json:
+        assert sorted(unchanged["refs"]) == ["main", "stable"]
+        assert destination.join("one.html").read() == "untouched"
+        manifest = json.loads(destination.join("versions.json").read())
+        assert [v["name"] for v in manifest["versions"]] == ["main", "other", "stable"]
+    else:
+        assert not unchanged["refs"]
+        assert not unchanged["root"]
+        expected = "Versions list changed, also building: main stable (root)"
+        assert ("INFO", expected) in records
+        assert 'href="other/one.html"' in destination.join("one.html").read()
+    assert sorted(json.loads(destination.join(STATE_FILE).read())["refs"]) == [
+        "main",
+        "other",
+        "stable",
+    ]
+
+
+def test_settings_changed(tmpdir, caplog, config, local_docs):
+    """Test that everything is built again when settings change.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    config.root_ref = "main"
+    destination = tmpdir.ensure_dir("destination")
+    run(local_docs, destination)
+    assert sorted(run(local_docs, destination)["refs"]) == ["main"]
+
+    config.banner_main_ref = "main"
+    config.show_banner = True
+    caplog.clear()
+    unchanged = run(local_docs, destination)
+    assert not unchanged["refs"]
+    assert not unchanged["root"]
+    records = [(r.levelname, r.message) for r in caplog.records]
+    expected = "Settings changed since the previous build, building everything."
+    assert ("INFO", expected) in records
+
+
+def test_failed_ref(tmpdir, caplog, config, local_docs):
+    """Test that a version that fails is skipped until its commit changes, instead of building everything every time.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    caplog.set_level(logging.INFO)
+    config.root_ref = "main"
+    pytest.run(local_docs, ["git", "checkout", "-b", "broken"])
+    local_docs.join("conf.py").write("master_doc = exception\n")
+    pytest.run(local_docs, ["git", "commit", "-am", "Broken version."])
+    pytest.run(local_docs, ["git", "push", "origin", "broken"])
+    destination = tmpdir.ensure_dir("destination")
+    run(local_docs, destination)
+    state = json.loads(destination.join(STATE_FILE).read())
+    assert sorted(state["refs"]) == ["main"]
+    assert list(state["failed"]) == ["broken"]
+
+    # Same commit, not tried again.
+    destination.join("one.html").write("untouched")
+    caplog.clear()
+    unchanged = run(local_docs, destination)
+    assert sorted(unchanged["refs"]) == ["main"]
+    assert unchanged["root"]
+    assert destination.join("one.html").read() == "untouched"
+    records = [(r.levelname, r.message) for r in caplog.records]
+    expected = "Failed in the previous build at the same commit, skipping: broken"
+    assert ("WARNING", expected) in records
+    assert list(json.loads(destination.join(STATE_FILE).read())["failed"]) == ["broken"]
+
+    # Fixed.
+    local_docs.join("conf.py").write("")
+    pytest.run(local_docs, ["git", "commit", "-am", "Fixed."])
+    pytest.run(local_docs, ["git", "push", "origin", "broken"])
+    caplog.clear()
+    run(local_docs, destination)
+    records = [(r.levelname, r.message) for r in caplog.records]
+    assert ("INFO", "Changed or new since the previous build: broken") in records
+    assert destination.join("broken", "one.html").check(file=True)
+    assert 'href="broken/one.html"' in destination.join("one.html").read()
+    state = json.loads(destination.join(STATE_FILE).read())
+    assert sorted(state["refs"]) == ["broken", "main"]
+    assert not state["failed"]
+
+
+@pytest.mark.parametrize("content", ["invalid", "[]", "{}", "no root"])
+def test_invalid_state(tmpdir, caplog, config, local_docs, content):
+    """Test that everything is built when the state file can't be used.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param str content: State file contents, or "no root" for the previous state without its root entry.
+    """
+    caplog.set_level(logging.INFO)
+    config.root_ref = "main"
+    destination = tmpdir.ensure_dir("destination")
+    run(local_docs, destination)
+    state = json.loads(destination.join(STATE_FILE).read())
+    if content == "no root":
+        content = json.dumps(dict(config=state["config"], refs=state["refs"]))
+    destination.join(STATE_FILE).write(content)
+
+    caplog.clear()
+    unchanged = run(local_docs, destination)
+    assert not unchanged["refs"]
+    assert not unchanged["root"]
+    assert sorted(json.loads(destination.join(STATE_FILE).read())["refs"]) == ["main"]
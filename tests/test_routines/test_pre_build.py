@@ -1,5 +1,6 @@
 """Test function in module."""
 
+import logging
 import posixpath
 
 import py
@@ -140,3 +141,43 @@ def test_error(config, local_docs):
     config.root_ref = "main"
     pre_build(str(local_docs), versions)
     assert [r["name"] for r in versions.remotes] == ["a_good", "c_good", "main"]
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_export_jobs(tmpdir, caplog, config, local_docs, use_cache):
+    """Test exporting several commits at the same time.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param bool use_cache: Link files from a blob store with --cache-dir.
+    """
+    caplog.set_level(logging.INFO)
+    for name in ("alpha", "beta", "gamma"):
+        pytest.run(local_docs, ["git", "checkout", "-b", name, "main"])
+        local_docs.join("{}.rst".format(name)).write("{}\n=====\n".format(name))
+        pytest.run(local_docs, ["git", "add", "{}.rst".format(name)])
+        pytest.run(local_docs, ["git", "commit", "-m", "Adding {}.".format(name)])
+        pytest.run(local_docs, ["git", "push", "origin", name])
+    config.export_jobs = 3
+    config.root_ref = "main"
+    if use_cache:
+        config.cache_dir = str(tmpdir.join("cache"))
+
+    versions = Versions(gather_git_info(str(local_docs), ["conf.py"], tuple(), tuple()))
+    shas = {r["sha"] for r in versions.remotes}
+    assert len(shas) > 3
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    exported = {p.basename for p in exported_root.listdir() if p.isdir()}
+    assert shas <= exported
+    for name in ("alpha", "beta", "gamma"):
+        exported = exported_root.join(versions[name]["sha"])
+        assert exported.join("{}.rst".format(name)).check(file=True)
+        assert exported.join("contents.rst").check(file=True)
+    assert not exported_root.join(versions["main"]["sha"], "alpha.rst").check()
+
+    records = [(r.levelname, r.message) for r in caplog.records]
+    expected = "Exporting {} commits with 3 threads.".format(len(shas))
+    assert ("INFO", expected) in records
+    assert ("INFO", "Exported {0}/{0} commits.".format(len(shas))) in records
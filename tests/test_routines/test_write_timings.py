@@ -0,0 +1,57 @@
+"""Test function in module."""
+
+import json
+import logging
+
+from sphinxcontrib_versioning.lib import TIMINGS
+from sphinxcontrib_versioning.routines import write_timings
+from sphinxcontrib_versioning.versions import Versions
+
+
+def test_write_timings(tmpdir, caplog):
+    """Test JSON report and summary. Steps measured per commit count towards every ref at that commit.
+
+    :param tmpdir: pytest fixture.
+    :param caplog: pytest extension fixture.
+    """
+    caplog.set_level(logging.INFO)
+    versions = Versions(
+        [
+            ("a" * 40, "main", "heads", "", 1, "conf.py"),
+            ("a" * 40, "v1.0", "tags", "", 1, "conf.py"),
+            ("b" * 40, "old", "heads", "", 0, "conf.py"),
+        ]
+    )
+    TIMINGS.reset()
+    start = TIMINGS.start
+    TIMINGS.record("export", "a" * 40, start, (start[0] + 2, start[1] + 1, 2048))
+    TIMINGS.record("export", "b" * 40, start, (start[0] + 1, start[1], 1024))
+    for name, seconds in (("main", 3), ("v1.0", 1), ("old", 1), ("main", 1)):
+        TIMINGS.record("build", name, start, (start[0] + seconds, start[1], 4096))
+    TIMINGS.record("build", None, start, (start[0] + 6, start[1] + 5, 4096))
+
+    path = tmpdir.join("timings.json")
+    write_timings(str(path), versions)
+    report = json.loads(path.read())
+
+    assert report["phases"] == dict(build=dict(count=1, cpu=5, peak_rss=4096, wall=6))
+    assert sorted(report["refs"]) == ["main", "old", "v1.0"]
+    assert report["refs"]["main"] == dict(
+        steps=dict(
+            build=dict(count=2, cpu=0, peak_rss=4096, wall=4),
+            export=dict(count=1, cpu=1, peak_rss=2048, wall=2),
+        ),
+        wall=6,
+    )
+    assert report["refs"]["v1.0"]["steps"]["export"]["wall"] == 2
+    assert report["refs"]["old"]["wall"] == 2
+    assert len(report["records"]) == 7
+    assert report["total"]["wall"] >= 0
+
+    messages = [r.message for r in caplog.records]
+    index = messages.index("Timings written to {}".format(path))
+    assert messages[index + 1].split() == "Phase wall s CPU s peak MiB".split()
+    assert messages[index + 2].split() == ["build", "6.00", "5.00", "4"]
+    header = "Slowest refs (wall s) total export build"
+    assert messages[index + 4].split() == header.split()
+    assert messages[index + 5].split() == ["main", "6.00", "2.00", "4.00"]
@@ -1,9 +1,18 @@
 """Test function."""
 
+import os
+import pstats
+
 import pytest
 
+from sphinxcontrib_versioning import sphinx_
 from sphinxcontrib_versioning.lib import HandledError
-from sphinxcontrib_versioning.sphinx_ import build
+from sphinxcontrib_versioning.sphinx_ import (
+    _load_versions,
+    build,
+    read_config,
+    store_versions,
+)
 from sphinxcontrib_versioning.versions import Versions
 
 
@@ -230,3 +239,240 @@ def test_subdirs(tmpdir, local_docs, urls):
                 ),
             ],
         )
+
+
+def test_doctree_dir(capfd, tmpdir, config, local_docs, urls):
+    """Verify documents read by read_config() aren't read again.
+
+    :param capfd: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    local_docs.join("conf.py").write('master_doc = "contents"\n')
+    config.overflow = ("-D", "project=SCV")  # Forces a full read.
+    doctree_dir = tmpdir.join("doctrees")
+    read_config(str(local_docs), "main", str(doctree_dir))
+    assert doctree_dir.join("environment.pickle").check(file=True)
+    capfd.readouterr()
+
+    target = tmpdir.ensure_dir("target")
+    versions = Versions([("", "main", "heads", "", 1, "conf.py")])
+    build(str(local_docs), str(target), versions, "main", False, None, str(doctree_dir))
+
+    stdout = capfd.readouterr()[0]
+    assert "0 added, 0 changed, 0 removed" in stdout
+    urls(target.join("contents.html"), ['<a href="contents.html">main</a>'])
+
+
+def test_worker_pool(tmpdir, config, local_docs):
+    """Verify reused worker processes don't carry over the previous version's modules or settings.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.max_worker_jobs = 3
+    pids = tmpdir.join("pids.txt")
+    local_docs.join("conf.py").write(
+        "import os, sys\n"
+        'sys.path.insert(0, os.path.abspath("."))\n'
+        "import scvmod\n"
+        "project = scvmod.NAME\n"
+        'open({!r}, "a").write("%d\\n" % os.getpid())\n'.format(str(pids))
+    )
+    versions = Versions([("", "main", "heads", "", 1, "conf.py")])
+
+    for name in ("First", "Second", "Third", "Fourth"):
+        local_docs.join("scvmod.py").write("NAME = '{}Project'\n".format(name))
+        assert read_config(str(local_docs), "main")["master_doc"] == "contents"
+        target = tmpdir.join(name)
+        build(str(local_docs), str(target), versions, "main", False)
+        assert "{}Project".format(name) in target.join("contents.html").read()
+
+    # 8 jobs, 3 per worker.
+    assert len(set(pids.read().split())) == 3
+
+
+def test_worker_pool_remotes_changed(tmpdir, config, local_docs, urls):
+    """Verify reused worker processes see remote dicts modified in place after their first build.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.max_worker_jobs = 2
+    versions = Versions(
+        [
+            ("", "main", "heads", "", 1, "conf.py"),
+            ("", "feature", "heads", "", 2, "conf.py"),
+        ]
+    )
+    target = tmpdir.join("before")
+    build(str(local_docs), str(target), versions, "main", False)
+    urls(target.join("one.html"), ['<a href="../feature/contents.html">feature</a>'])
+
+    # Set like pre_build() does after the root build.
+    versions["feature"]["root_dir"] = "feature_dir"
+    versions["feature"]["found_docs"] = ("contents", "one")
+    versions["feature"]["master_doc"] = "contents"
+    target = tmpdir.join("after")
+    build(str(local_docs), str(target), versions, "main", False)
+    urls(target.join("one.html"), ['<a href="../feature_dir/one.html">feature</a>'])
+
+
+def test_fragments(tmpdir, config, local_docs, urls):
+    """Verify the sidebar and banner reused across pages have the right URLs for each page.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.banner_main_ref = "feature"
+    config.show_banner = True
+    local_docs.join("contents.rst").write("    sub/four\n    sub/five\n", mode="a")
+    local_docs.ensure("sub", "four.rst").write("Four\n====\n")
+    local_docs.ensure("sub", "five.rst").write("Five\n====\n")
+    versions = Versions(
+        [
+            ("", "main", "heads", "", 1, "conf.py"),
+            ("", "feature", "heads", "", 2, "conf.py"),
+        ]
+    )
+    versions["feature"]["found_docs"] = ("contents", "one", "sub/four")
+
+    target = tmpdir.ensure_dir("target")
+    build(str(local_docs), str(target), versions, "main", False)
+
+    expected = [
+        (("one.html",), "one.html", "../feature/one.html"),
+        (("two.html",), "two.html", "../feature/contents.html"),
+        (("sub", "four.html"), "four.html", "../../feature/sub/four.html"),
+        (("sub", "five.html"), "five.html", "../../feature/contents.html"),
+    ]
+    for path, main_url, feature_url in expected:
+        contents = urls(
+            target.join(*path),
+            [
+                '<a href="{}">main</a>'.format(main_url),
+                '<a href="{}">feature</a>'.format(feature_url),
+            ],
+        )
+        assert "placeholder" not in contents
+        assert 'class="scv-banner' in contents
+        assert ('<a href="{}"><b>Warning:'.format(feature_url) in contents) is (
+            "contents" not in feature_url
+        )
+
+
+def test_fragments_custom(tmpdir, config, local_docs):
+    """Verify sidebar and banner templates that aren't this extension's own are rendered for every page.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.banner_main_ref = "feature"
+    config.show_banner = True
+    local_docs.join("conf.py").write(
+        "import os\n"
+        "from sphinx.jinja2glue import SphinxFileSystemLoader\n"
+        "def builder_inited(app):\n"
+        '    path = os.path.join(os.path.dirname(__file__), "_custom")\n'
+        "    app.builder.templates.loaders.insert(0, SphinxFileSystemLoader(path))\n"
+        "def setup(app):\n"
+        '    app.connect("builder-inited", builder_inited)\n'
+    )
+    local_docs.ensure("_custom", "banner.html").write(
+        '<p class="custom-banner">{{ title }} {{ vhasdoc("feature") }}</p>\n'
+    )
+    versions = Versions(
+        [
+            ("", "main", "heads", "", 1, "conf.py"),
+            ("", "feature", "heads", "", 2, "conf.py"),
+        ]
+    )
+    versions["feature"]["found_docs"] = ("contents", "one")
+
+    target = tmpdir.ensure_dir("target")
+    build(str(local_docs), str(target), versions, "main", False)
+    # Same directory depth and same versions have them, but different titles.
+    assert '<p class="custom-banner">One True</p>' in target.join("one.html").read()
+    assert '<p class="custom-banner">Two False</p>' in target.join("two.html").read()
+    assert '<p class="custom-banner">Three False</p>' in target.join("three.html").read()
+
+
+
+def teststore_versions(monkeypatch):
+    """Verify Versions is written to a file once and rewritten only after anything in it changes.
+
+    :param monkeypatch: pytest fixture.
+    """
+    monkeypatch.setattr("sphinxcontrib_versioning.sphinx_.LOADED_VERSIONS", dict())
+    monkeypatch.setattr("sphinxcontrib_versioning.sphinx_.VERSIONS_FILES", dict())
+    versions = Versions(
+        [
+            ("", "main", "heads", "", 1, "conf.py"),
+            ("", "feature", "heads", "", 2, "conf.py"),
+        ]
+    )
+    versions["feature"]["found_docs"] = ("contents", "one")
+    versions.pack_found_docs()
+    path = store_versions(versions)
+    assert store_versions(versions) == path
+    snapshot = _load_versions(path)[0]  # What forked children see.
+    assert snapshot is not versions
+    assert [r["name"] for r in snapshot.remotes] == ["main", "feature"]
+
+    versions["main"]["root_dir"] = "changed"  # In place, like pre_build().
+    changed_path = store_versions(versions)
+    assert changed_path != path
+    assert _load_versions(changed_path)[0]["main"]["root_dir"] == "changed"
+    assert snapshot["main"]["root_dir"] == "main"
+
+    versions.remotes.pop(0)
+    new_path = store_versions(versions)
+    assert new_path != path
+    assert os.path.isfile(path) and os.path.isfile(new_path)
+
+    # What WorkerPool workers see.
+    sphinx_.LOADED_VERSIONS.clear()
+    loaded, digest = _load_versions(new_path)
+    assert [r["name"] for r in loaded.remotes] == ["feature"]
+    assert list(loaded["feature"]["found_docs"]) == ["contents", "one"]
+    assert new_path.endswith("{}.pickle".format(digest))
+    assert _load_versions(new_path)[0] is loaded
+
+
+@pytest.mark.parametrize("max_worker_jobs", [1, 2])
+def test_profile_dir(tmpdir, config, local_docs, max_worker_jobs):
+    """Verify each child process writes a profile named after the ref, without overwriting earlier ones.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param int max_worker_jobs: Also run children in a WorkerPool.
+    """
+    config.max_worker_jobs = max_worker_jobs
+    config.overflow = ("-D", "project=Profiled")  # Read documents instead of probing.
+    config.profile_dir = str(tmpdir.join("profiles"))
+    versions = Versions([("", "feature/x", "heads", "", 1, "conf.py")])
+
+    read_config(str(local_docs), "feature/x")
+    build(str(local_docs), str(tmpdir.join("root")), versions, "feature/x", True)
+    build(str(local_docs), str(tmpdir.join("one")), versions, "feature/x", False)
+    build(str(local_docs), str(tmpdir.join("two")), versions, "feature/x", False)
+
+    profiles = tmpdir.join("profiles")
+    assert sorted(p.basename for p in profiles.listdir()) == [
+        "feature_x.build.2.pstats",
+        "feature_x.build.pstats",
+        "feature_x.read.pstats",
+        "feature_x.root.pstats",
+    ]
+    for path in profiles.listdir():
+        functions = [f[2] for f in pstats.Stats(str(path)).stats]
+        assert "build_main" in functions
@@ -3,7 +3,7 @@
 import pytest
 
 from sphinxcontrib_versioning.lib import HandledError
-from sphinxcontrib_versioning.sphinx_ import read_config
+from sphinxcontrib_versioning.sphinx_ import _probe_config, read_config
 
 
 @pytest.mark.parametrize("mode", ["default", "overflow", "conf.py"])
@@ -26,10 +26,7 @@ def test(config, local_docs, mode):
         expected = "index2"
 
     config = read_config(str(local_docs), "main")
-    if mode == "default":
-        assert config["master_doc"] == "index"
-    else:
-        assert config["master_doc"] == expected
+    assert config["master_doc"] == expected  # Sphinx falls back to contents without index.
     assert sorted(config["found_docs"]) == [expected, "one", "three", "two"]
 
 
@@ -41,3 +38,47 @@ def test_sphinx_error(local_docs):
     local_docs.join("conf.py").write("undefined")
     with pytest.raises(HandledError):
         read_config(str(local_docs), "main")
+
+
+@pytest.mark.parametrize(
+    "conf",
+    [
+        "",
+        'master_doc = "one"\nexclude_patterns = ["two.rst"]\nscv_sort = ("alpha",)\n',
+        'source_suffix = [".rst", ".txt"]\ntemplates_path = ["sub"]\n',
+        'root_doc = "two"\nmaster_doc = "one"\n',
+    ],
+)
+def test_probe(config, local_docs, conf):
+    """Verify the probe finds the same config values as Sphinx's read phase.
+
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param str conf: Contents of conf.py.
+    """
+    local_docs.join("conf.py").write(conf)
+    local_docs.ensure("sub", "four.rst").write("Four\n====\n")
+    local_docs.join("five.txt").write("Five\n====\n")
+    probed = _probe_config(str(local_docs), config)
+    assert probed is not None
+
+    config.overflow += ("-q",)  # Forces the full read.
+    expected = read_config(str(local_docs), "main")
+    assert sorted(probed.pop("found_docs")) == sorted(expected.pop("found_docs"))
+    assert probed == expected
+    if "root_doc" in conf:
+        assert probed["master_doc"] == "two"
+
+
+@pytest.mark.parametrize(
+    "conf", ['extensions = ["unknown_parser"]\n', "def setup(app):\n    pass\n"]
+)
+def test_probe_fallback(config, local_docs, conf):
+    """Verify the probe gives up when extensions could change which documents exist.
+
+    :param sphinxcontrib_versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param str conf: Contents of conf.py.
+    """
+    local_docs.join("conf.py").write(conf)
+    assert _probe_config(str(local_docs), config) is None
@@ -1,5 +1,7 @@
 """Test methods in Versions class."""
 
+import pickle
+
 import pytest
 
 from sphinxcontrib_versioning.versions import Versions
@@ -233,3 +235,54 @@ def test_id():
     versions = Versions(REMOTES)
     for remote in versions.remotes:
         assert remote["id"] == "{}/{}".format(remote["kind"], remote["name"])
+
+
+def test_getitem_index():
+    """Test lookups stay correct after remotes are removed or replaced."""
+    remotes = [r[:3] + (r[0][:8],) + r[3:] for r in REMOTES]
+    versions = Versions(remotes + [(REMOTES[1][0], "dup", "heads", "", 1, "README")])
+    assert versions["main"]["name"] == "main"
+    assert versions["tags/v1.2.0"]["name"] == "v1.2.0"
+    assert versions[1464657293]["name"] == "v10.0.0"
+    assert versions[REMOTES[1][0]]["name"] == "main"  # First one with that sha.
+    assert versions["abaaa35"]["name"] == "main"  # Abbreviated.
+    assert versions["358379408d"]["name"] == "main"  # Any substring.
+
+    versions.remotes.pop(versions.remotes.index(versions["main"]))
+    assert versions["abaaa35"]["name"] == "dup"
+    with pytest.raises(KeyError):
+        versions["main"]
+
+    versions.remotes = versions.remotes[:1]
+    assert versions[0]["name"] == "zh-pages"
+    with pytest.raises(KeyError):
+        versions["dup"]
+
+
+def test_pack_found_docs():
+    """Test found_docs of all versions sharing one page table."""
+    remotes = [r[:3] + (r[0][:8],) + r[3:] for r in REMOTES[:3]]
+    versions = Versions(remotes)
+    versions["zh-pages"]["found_docs"] = ("contents", "sub/one")
+    versions["main"]["found_docs"] = ("contents", "two", "sub/one")
+    versions.pack_found_docs()
+
+    assert versions.page_table.names == ("contents", "sub/one", "two")
+    found_docs = versions["main"]["found_docs"]
+    assert found_docs.bitmap == b"\x07"
+    assert found_docs == {"contents", "sub/one", "two"}
+    assert list(found_docs) == ["contents", "sub/one", "two"]
+    assert "two" in found_docs
+    assert "two" not in versions["zh-pages"]["found_docs"]
+    assert "three" not in found_docs
+    assert len(versions[2]["found_docs"]) == 0
+    assert repr(found_docs) == "FoundDocs(('contents', 'sub/one', 'two'))"
+
+    # Table is pickled once.
+    unpickled = pickle.loads(pickle.dumps(versions))
+    assert unpickled["main"]["found_docs"] == found_docs
+    assert unpickled["main"]["found_docs"].table is unpickled[0]["found_docs"].table
+
+    versions.context.update(current_version="zh-pages", pagename="two", scv_is_root=False)
+    assert versions.vhasdoc("main") is True
+    assert versions.vpathto("main") == "../main/two.html"
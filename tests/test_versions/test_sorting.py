@@ -2,7 +2,7 @@
 
 import pytest
 
-from sphinxcontrib_versioning.versions import Versions
+from sphinxcontrib_versioning.versions import multi_sort, semver_key, Versions
 
 REMOTES = (
     (
@@ -328,3 +328,27 @@ def test_sort(remotes, sort):
         expected = [i[1] for i in remotes]
 
     assert actual == expected
+
+
+def test_semver_key():
+    """Test sort keys of valid and invalid versions and that they're cached on remotes."""
+    names = ["main", "v1.0.0b3", "v1.0.0", "V10", "1.0.0a", "v2.0.0.1", "zh-pages"]
+    assert semver_key("v1.10.0b3") == (0, -1, -10, 0, 0, 0, 0, 0, "b3")
+    assert semver_key("main") == (1,)
+    assert sorted(names, key=semver_key) == [
+        "V10",
+        "v2.0.0.1",
+        "v1.0.0",
+        "1.0.0a",
+        "v1.0.0b3",
+        "main",
+        "zh-pages",
+    ]
+
+    remotes = [dict(name=n, date=i % 3) for i, n in enumerate(names)]
+    multi_sort(remotes, ["semver", "time"])
+    assert [r["name"] for r in remotes][-2:] == ["main", "zh-pages"]
+    assert remotes[0]["semver"] == (0, -10, 0, 0, 0, 0, 0, 0, "")
+    remotes[0]["semver"] = (2,)  # Cached, not parsed again.
+    multi_sort(remotes, ["semver"])
+    assert remotes[-1]["name"] == "V10"
@@ -1,5 +1,7 @@
 """Test methods in Versions class."""
 
+import pytest
+
 from sphinxcontrib_versioning.versions import Versions
 
 
@@ -268,3 +270,34 @@ def test_c():
         ("b", "../../../../b/contents.html"),
         ("c", "D.html"),
     ]
+
+
+def test_link_table():
+    """Test links are computed once per page and follow changes to the page and to the remotes."""
+    versions = Versions(
+        [i * 5, i, "tags" if i == "c" else "heads", i * 8, 1465766422, "README"]
+        for i in ("a", "b", "c")
+    )
+    versions.context.update(current_version="a", scv_is_root=False, pagename="1")
+    versions["b"]["found_docs"] = ("contents", "1")
+    versions["c"]["found_docs"] = ("contents",)
+
+    expected = [
+        ("a", "1.html", True),
+        ("b", "../b/1.html", True),
+        ("c", "../c/contents.html", False),
+    ]
+    assert versions.links == expected
+    assert versions.branches == [("a", "1.html"), ("b", "../b/1.html")]
+    assert versions.tags == [("c", "../c/contents.html")]
+    assert versions._link_table() is versions._link_table()  # Cached.
+
+    versions.context["pagename"] = "contents"
+    assert versions.vhasdoc("c") is True
+    assert versions.vpathto("c") == "../c/contents.html"
+    assert versions.vpathto("tags/c") == "../c/contents.html"  # Not a name, computed directly.
+
+    versions.remotes.pop(1)
+    assert list(versions) == [("a", "contents.html"), ("c", "../c/contents.html")]
+    with pytest.raises(KeyError):
+        versions.vpathto("b")